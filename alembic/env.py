@@ -1,17 +1,16 @@
 from logging.config import fileConfig
 import os
 
-from dotenv import load_dotenv
 from sqlalchemy import engine_from_config, pool
 from alembic import context
 
-from backend.db import Base
+from backend.db import Base, load_env
 import backend.models  # ensure models are registered
 
 # -------------------------------------------------
 # Load environment variables from .env
 # -------------------------------------------------
-load_dotenv()
+load_env()
 
 # Alembic Config object
 config = context.config
@@ -41,6 +40,14 @@ if config.config_file_name is not None:
 # -------------------------------------------------
 target_metadata = Base.metadata
 
+# Type/server-default comparison only matters when autogenerating revisions;
+# skip the extra reflection on plain `alembic upgrade`.
+is_autogenerate = bool(getattr(config.cmd_opts, "autogenerate", False))
+compare_opts = {
+    "compare_type": is_autogenerate,
+    "compare_server_default": is_autogenerate,
+}
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
@@ -51,8 +58,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
-        compare_type=True,
-        compare_server_default=True,
+        **compare_opts,
     )
 
     with context.begin_transaction():
@@ -71,8 +77,7 @@ def run_migrations_online() -> None:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
-            compare_type=True,
-            compare_server_default=True,
+            **compare_opts,
         )
 
         with context.begin_transaction():
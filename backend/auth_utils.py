@@ -1,57 +1,224 @@
-from dotenv import load_dotenv
 import os
-from backend.db import SessionLocal
+import time
+from functools import lru_cache
+from cachetools import TTLCache
+from uuid import uuid4
+from backend.db import SessionLocal, get_engine, load_env
 from datetime import datetime, timedelta
-from jose import jwt , JWTError
+from types import SimpleNamespace
+import orjson
+import jwt
+from jwt import ExpiredSignatureError, PyJWTError as JWTError
+from jwt.api_jws import PyJWS
 from fastapi import Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from starlette.status import HTTP_401_UNAUTHORIZED
+from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
 from backend import models
-from backend.db import get_db
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-load_dotenv()
+load_env()
 
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+ACCESS_TOKEN_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+ACCESS_TOKEN_EXPIRES = timedelta(seconds=ACCESS_TOKEN_EXPIRE_SECONDS)
 
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY environment variable is missing or not set.")
 
+REDIS_URL = os.getenv("REDIS_URL")
 
+# Revoked token ids (jti) live in Redis so every worker sees them; the key
+# expires together with the token. Without REDIS_URL fall back to a
+# process-local jti -> exp map.
+redis_client = None
+if REDIS_URL:
+    import redis
+    redis_client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(REDIS_URL))
 
-token_blacklist = set()  # In-memory token blacklist for simplicity
+token_blacklist = {}  # jti -> exp (unix seconds), used only without Redis
+
+USER_CACHE_TTL = 60  # seconds
+
+# user_id -> user snapshot dict, used only without Redis
+user_cache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL)
+
+# Signs pre-serialized payloads, so claims go through orjson instead of json.dumps
+_jws = PyJWS()
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    ttl = expires_delta.total_seconds() if expires_delta else ACCESS_TOKEN_EXPIRE_SECONDS
+    to_encode.update({"exp": int(time.time() + ttl), "jti": uuid4().hex})
+    return _jws.encode(orjson.dumps(to_encode), SECRET_KEY, algorithm=ALGORITHM)
+
+@lru_cache(maxsize=4096)
+def _decode(token: str) -> dict:
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+def decode_token(token: str) -> dict:
+    # Memoized per raw token: the HMAC check runs once, later hits only
+    # re-check expiry. The returned dict is shared, don't mutate it.
+    payload = _decode(token)
+    if payload.get("exp", 0) <= time.time():
+        raise ExpiredSignatureError("Signature has expired.")
+    return payload
 
 def blacklist_token(token: str):
-    token_blacklist.add(token)
-
-
-def verify_token(request: Request, db: Session = Depends(get_db)):
+    try:
+        payload = decode_token(token)
+    except JWTError:
+        return  # already invalid or expired, nothing to revoke
+
+    jti = payload.get("jti")
+    exp = int(payload.get("exp", 0))
+    if not jti:
+        return
+
+    if redis_client is not None:
+        redis_client.set(f"bl:{jti}", "1", exat=exp)
+        return
+
+    now = time.time()
+    for stale in [k for k, v in token_blacklist.items() if v <= now]:
+        del token_blacklist[stale]
+    token_blacklist[jti] = exp
+
+def is_token_blacklisted(payload: dict) -> bool:
+    jti = payload.get("jti")
+    if not jti:
+        return False
+
+    if redis_client is not None:
+        return bool(redis_client.exists(f"bl:{jti}"))
+
+    return jti in token_blacklist
+
+
+class CurrentUser(SimpleNamespace):
+    """Cached snapshot of the authenticated user.
+
+    Supports attribute access (``user.role``) as well as the dict-style
+    access some routers use (``user.get("role")``, ``user["business_id"]``).
+    """
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "CurrentUser":
+        fields = dict(data)
+        last_login = fields.pop("last_login", None)
+        return cls(
+            **fields,
+            user_id=data["id"],
+            last_login=datetime.fromisoformat(last_login) if last_login else None,
+            business=SimpleNamespace(business_name=data["business_name"]) if data.get("business_name") else None,
+            branch=SimpleNamespace(id=data["branch_id"], name=data["branch_name"]) if data.get("branch_name") else None,
+        )
+
+def get_cached_user(user_id: int) -> CurrentUser | None:
+    if redis_client is not None:
+        raw = redis_client.get(f"user:{user_id}")
+        data = orjson.loads(raw) if raw else None
+    else:
+        data = user_cache.get(user_id)
+    return CurrentUser.from_snapshot(data) if data else None
+
+def load_user(db: Session, user_id: int) -> CurrentUser | None:
+    # Narrow column fetch (no ORM identity map / relationship setup), then cached
+    row = db.execute(
+        select(
+            models.User.id,
+            models.User.username,
+            models.User.role,
+            models.User.business_id,
+            models.User.branch_id,
+            models.User.is_active,
+            models.User.last_login,
+            models.Business.business_name,
+            models.Branch.name.label("branch_name"),
+        )
+        .outerjoin(models.Business, models.Business.id == models.User.business_id)
+        .outerjoin(models.Branch, models.Branch.id == models.User.branch_id)
+        .where(models.User.id == user_id)
+    ).first()
+
+    if row is None:
+        return None
+
+    data = row._asdict()
+    data["last_login"] = data["last_login"].isoformat() if data["last_login"] else None
+
+    if redis_client is not None:
+        redis_client.setex(f"user:{user_id}", USER_CACHE_TTL, orjson.dumps(data))
+    else:
+        user_cache[user_id] = data
+    return CurrentUser.from_snapshot(data)
+
+def invalidate_user(user_id: int):
+    if redis_client is not None:
+        redis_client.delete(f"user:{user_id}")
+    else:
+        user_cache.pop(user_id, None)
+
+
+def verify_token(request: Request):
     token = request.cookies.get("access_token")
 
-    if not token or token in token_blacklist:
+    if not token:
         raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Not authenticated")
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
+
+        if is_token_blacklisted(payload):
+            raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+
         user_id = payload.get("user_id")
 
         if not user_id:
             raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-        user = db.query(models.User).filter(models.User.id == user_id).first()
+        # The auth middleware usually resolved this user already for the request
+        user = getattr(request.state, "current_user", None)
+        if user is None or user.id != user_id:
+            user = get_cached_user(user_id)
+            if user is None:
+                # Session only on a cache miss
+                get_engine()
+                db = SessionLocal()
+                try:
+                    user = load_user(db, user_id)
+                finally:
+                    db.close()
 
         if not user:
             raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="User not found")
 
+        request.state.current_user = user
         return user
 
     except JWTError:
-        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
\ No newline at end of file
+        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+
+
+def require_roles(*roles: str, detail: str = "Not authorized"):
+    # Role gate as a dependency. Declare it before the DB session dependency
+    # so a rejected request never checks out a pool connection.
+    allowed = frozenset(roles)
+
+    async def dependency(current_user: CurrentUser = Depends(verify_token)) -> CurrentUser:
+        if current_user.role not in allowed:
+            raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail=detail)
+        return current_user
+
+    return dependency
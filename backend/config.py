@@ -1,8 +1,20 @@
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TEMPLATE_DIR = os.path.join(BASE_DIR, "frontend")
 
+# Compiled template bytecode is shared across workers/restarts
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "jinja_cache"))
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+
 templates = Jinja2Templates(directory=TEMPLATE_DIR)
-templates.env.globals["current_user"] = lambda request: getattr(request.state, "current_user", None)
\ No newline at end of file
+templates.env.bytecode_cache = FileSystemBytecodeCache(
+    directory=JINJA_CACHE_DIR,
+    pattern="__jinja2_%s.cache"
+)
+# Skip mtime checks on every render unless explicitly enabled (local dev)
+templates.env.auto_reload = os.getenv("JINJA_AUTO_RELOAD", "false").lower() == "true"
+templates.env.globals["current_user"] = lambda request: getattr(request.state, "current_user", None)
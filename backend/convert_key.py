@@ -8,15 +8,22 @@ sQqn8Nmpo2v6aUFvte9D9AIVKhmhRANCAASTPfjVL0WklYy+N8OjvZxKUXHGVOFw
 sFx8eWFfcSxocd1ydqFJvxFr50Wr9S/uqsM19HIPfDfCZaprT7pwDuMn
 """.replace("\n", "").strip()
 
-der = base64.b64decode(DER_B64)
+_backend = default_backend()
 
-key = serialization.load_der_private_key(der, password=None, backend=default_backend())
 
-pem = key.private_bytes(
-    encoding=serialization.Encoding.PEM,
-    format=serialization.PrivateFormat.PKCS8,
-    encryption_algorithm=serialization.NoEncryption(),
-)
+def convert(der_b64: str) -> str:
+    """PKCS#8 DER (base64) private key -> PEM text."""
+    der = base64.b64decode(der_b64, validate=True)
 
-print(pem.decode())
+    key = serialization.load_der_private_key(der, password=None, backend=_backend)
 
+    pem = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    return pem.decode()
+
+
+if __name__ == "__main__":
+    print(convert(DER_B64))
@@ -1,5 +1,5 @@
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.backends import default_backend
 import base64
 
 PEM_PUBLIC = b"""-----BEGIN PUBLIC KEY-----
@@ -7,13 +7,21 @@ MFkwEwYHKoZIzj0CAQYIKoZIzj0DAQcDQgAEkz341S9FpJWMvjfDo72cSlFxxlTh
 cLBcfHlhX3EsaHHdcnahSb8Ra+dFq/Uv7qrDNfRyD3w3wmWqa0+6cA7jJw==
 -----END PUBLIC KEY-----"""
 
-pub = serialization.load_pem_public_key(PEM_PUBLIC)
+_backend = default_backend()
 
-# Raw uncompressed point (65 bytes) -> base64url (no "=")
-raw = pub.public_bytes(
-    encoding=serialization.Encoding.X962,
-    format=serialization.PublicFormat.UncompressedPoint
-)
 
-vapid_public_key = base64.urlsafe_b64encode(raw).rstrip(b"=").decode("utf-8")
-print("VAPID_PUBLIC_KEY =", vapid_public_key)
+def convert(pem_public: bytes) -> str:
+    """PEM public key -> browser VAPID key (raw uncompressed point, base64url, no "=")."""
+    pub = serialization.load_pem_public_key(pem_public, backend=_backend)
+
+    # Raw uncompressed point (65 bytes) -> base64url (no "=")
+    raw = pub.public_bytes(
+        encoding=serialization.Encoding.X962,
+        format=serialization.PublicFormat.UncompressedPoint
+    )
+
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("utf-8")
+
+
+if __name__ == "__main__":
+    print("VAPID_PUBLIC_KEY =", convert(PEM_PUBLIC))
@@ -1,21 +1,34 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from dotenv import load_dotenv
+import logging
 import os
+from functools import cache
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 # -------------------------------------------------
 # Load environment variables from backend/.env
 # -------------------------------------------------
 env_path = Path(__file__).resolve().parent / ".env"
-load_dotenv(dotenv_path=env_path)
+
+
+@cache
+def load_env():
+    """Parse .env once per process (backend/.env first, then the nearest .env)."""
+    load_dotenv(dotenv_path=env_path) or load_dotenv()
+
+
+load_env()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is missing or not set.")
 
-print("DATABASE_URL LOADED:", DATABASE_URL)
+logger.debug("DATABASE_URL loaded")
 
 # -------------------------------------------------
 # Ensure correct MySQL driver format (safe conversion)
@@ -25,24 +38,64 @@ if DATABASE_URL.startswith("mysql://"):
         "mysql://", "mysql+pymysql://", 1
     )
 
+# Async driver for the same database (aiomysql speaks the same protocol)
+ASYNC_DATABASE_URL = DATABASE_URL.replace("mysql+pymysql://", "mysql+aiomysql://", 1)
+
 # -------------------------------------------------
-# Create engine
+# Session factories (bound to their engine on first use)
 # -------------------------------------------------
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,   # Reconnect automatically if MySQL times out
-    pool_recycle=280,     # Recycle connections every ~5 minutes
+AsyncSessionLocal = async_sessionmaker(
+    autoflush=False,
+    expire_on_commit=False,
 )
 
-# -------------------------------------------------
-# Session factory
-# -------------------------------------------------
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
-    bind=engine
+    expire_on_commit=False,  # Keep loaded attributes after commit (no re-SELECT)
 )
 
+# -------------------------------------------------
+# Create engine (lazily, so importing backend.db doesn't build a pool)
+# -------------------------------------------------
+@cache
+def get_engine():
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=int(os.getenv("DB_POOL_SIZE", 20)),
+        # 20 + 40 covers Starlette's 40-thread pool for sync handlers, so
+        # requests don't queue on the pool
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 40)),
+        pool_use_lifo=True,   # Reuse the most recently returned (warm) connection
+        pool_pre_ping=True,   # Reconnect automatically if MySQL times out
+        pool_recycle=280,     # Recycle connections every ~5 minutes
+        query_cache_size=1200,  # compiled-SQL cache (default 500)
+    )
+    SessionLocal.configure(bind=engine)
+    return engine
+
+
+@cache
+def get_async_engine():
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=int(os.getenv("DB_POOL_SIZE", 20)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 40)),
+        pool_use_lifo=True,
+        pool_pre_ping=True,
+        pool_recycle=280,
+        query_cache_size=1200,
+    )
+    AsyncSessionLocal.configure(bind=async_engine)
+    return async_engine
+
+
+def __getattr__(name):
+    # Keeps `from backend.db import engine` working without an import-time engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # -------------------------------------------------
 # Base model
 # -------------------------------------------------
@@ -52,8 +105,32 @@ Base = declarative_base()
 # Dependency for FastAPI
 # -------------------------------------------------
 def get_db():
+    # Plain session per request: sessions are cheap, the pooled engine keeps
+    # the TCP/TLS connections warm. Not a scoped_session, since FastAPI can
+    # run a sync dependency's setup and teardown on different pool threads.
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def fetch_all(stmt, scalars: bool = True):
+    """Run a read-only select on its own pooled connection.
+
+    One AsyncSession can't run statements concurrently, so independent page
+    queries each get a session and are awaited together with asyncio.gather.
+    Each gather holds that many connections at once; DB_POOL_SIZE should
+    cover gather width x concurrent page loads.
+    """
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(stmt)
+        return result.scalars().all() if scalars else result.all()
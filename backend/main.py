@@ -1,20 +1,24 @@
+import os
+import re
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse, JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import RedirectResponse, ORJSONResponse, FileResponse
 
-from backend.db import engine, Base, SessionLocal
+from backend.db import get_engine, SessionLocal
+from backend.config import BASE_DIR
+from backend.static_utils import CachedStaticFiles
 import backend.models  # Ensure models are imported
 from backend import models
 
 from routers import auth, product, sales, superadmin, push, onboarding, inventory
-from backend.auth_utils import SECRET_KEY, ALGORITHM
-from jose import jwt, JWTError
+from backend.auth_utils import decode_token, get_cached_user, load_user, JWTError
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
-# ✅ Mount static files (KEEP ONLY ONE)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+
+# ✅ Mount static files (KEEP ONLY ONE) — absolute path so cwd doesn't matter
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIR, check_dir=False), name="static")
 
 
 # ✅ HTTPS redirect middleware
@@ -27,51 +31,54 @@ async def enforce_https(request: Request, call_next):
     return await call_next(request)
 
 
+PUBLIC_PATHS = [
+    "/auth/login", "/auth/login_form", "/auth/register",
+    "/static", "/favicon.ico",
+    "/superadmin/create_superadmin",
+    "/docs", "/openapi.json", "/redoc",
+    "/swagger-ui", "/swagger-ui-init.js", "/swagger-ui-bundle.js",
+    "/swagger-ui.css", "/docs/oauth2-redirect",
+    "/service-worker.js"
+]
+# Prefix match, same semantics as str.startswith over PUBLIC_PATHS
+_PUBLIC_RE = re.compile("(?:" + "|".join(re.escape(p) for p in PUBLIC_PATHS) + ")")
+
+
 # ✅ JWT auth middleware + (OPTION A) Attach current_user to request automatically
 @app.middleware("http")
 async def redirect_or_json_on_unauthorized(request: Request, call_next):
     # ✅ Always set it so templates never crash
     request.state.current_user = None
 
-    public_paths = [
-        "/auth/login", "/auth/login_form", "/auth/register",
-        "/static", "/favicon.ico",
-        "/superadmin/create_superadmin",
-        "/docs", "/openapi.json", "/redoc",
-        "/swagger-ui", "/swagger-ui-init.js", "/swagger-ui-bundle.js",
-        "/swagger-ui.css", "/docs/oauth2-redirect",
-        "/service-worker.js"
-    ]
-
-    if any(request.url.path.startswith(p) for p in public_paths):
+    if _PUBLIC_RE.match(request.url.path):
         return await call_next(request)
 
     token = request.cookies.get("access_token")
     if not token:
         if "application/json" in request.headers.get("accept", ""):
-            return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+            return ORJSONResponse(status_code=401, content={"detail": "Not authenticated"})
         return RedirectResponse(url="/auth/login")
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
 
         # ✅ Get user id from token (supports common keys)
         user_id = payload.get("user_id") or payload.get("id") or payload.get("sub")
 
         if user_id is not None:
-            db = SessionLocal()
-            try:
-                request.state.current_user = (
-                    db.query(models.User)
-                    .filter(models.User.id == int(user_id))
-                    .first()
-                )
-            finally:
-                db.close()
+            user_id = int(user_id)
+            user = get_cached_user(user_id)
+            if user is None:
+                db = SessionLocal()
+                try:
+                    user = load_user(db, user_id)
+                finally:
+                    db.close()
+            request.state.current_user = user
 
     except JWTError:
         if "application/json" in request.headers.get("accept", ""):
-            return JSONResponse(status_code=401, content={"detail": "Invalid or expired token"})
+            return ORJSONResponse(status_code=401, content={"detail": "Invalid or expired token"})
         return RedirectResponse(url="/auth/login")
     except Exception:
         # don’t let user loading crash the request
@@ -81,8 +88,7 @@ async def redirect_or_json_on_unauthorized(request: Request, call_next):
 
 
 # ✅ Create database tables
-backend.models.Base.metadata.create_all(bind=engine)
-print("✅ Tables that will be created:", Base.metadata.tables.keys())
+backend.models.Base.metadata.create_all(bind=get_engine())
 
 
 # ✅ CORS
@@ -117,7 +123,7 @@ def root():
 @app.get("/service-worker.js")
 def sw():
     return FileResponse(
-        "static/service-worker.js",
+        os.path.join(STATIC_DIR, "service-worker.js"),
         media_type="application/javascript",
         headers={"Service-Worker-Allowed": "/"}
     )
\ No newline at end of file
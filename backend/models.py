@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime, ForeignKey, Boolean, func, UniqueConstraint, Numeric, Text
+    Column, Integer, String, DateTime, ForeignKey, Boolean, func, UniqueConstraint, Numeric, Text, Index
 )
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy import event
@@ -16,36 +16,40 @@ class Product(Base):
     name = Column(String(255), index=True, nullable=False)
     business_id = Column(Integer, ForeignKey("business.id"), nullable=False)
     min_stock = Column(Integer, default=5, nullable=False)
-    price = Column(Float, nullable=True)
-    buying_price = Column(Float, nullable=True)
+    price = Column(Numeric(10, 2, asdecimal=False), nullable=True)
+    buying_price = Column(Numeric(10, 2, asdecimal=False), nullable=True)
     quantity = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
      
     @validates("price")
     def validate_price(self, key, value):
-        if self.buying_price is not None and value < self.buying_price:
+        # Read the loaded value straight from __dict__ (skips the attribute descriptor)
+        buying_price = self.__dict__.get("buying_price")
+        if value is None or buying_price is None:
+            return value
+        if value < buying_price:
             raise ValueError("Selling price cannot be below buying price")
         return value
 
         
-    sales = relationship("Sales", back_populates="product")
-    business = relationship("Business", back_populates="products")
+    sales = relationship("Sales", back_populates="product", lazy="raise_on_sql")
+    business = relationship("Business", back_populates="products", lazy="raise_on_sql")
 
 
 class Sales(Base):
     __tablename__ = "sales"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
-    total_price = Column(Float, nullable=False)
+    total_price = Column(Numeric(10, 2, asdecimal=False), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_demo = Column(Boolean, default=False, nullable=False)
     
 
-    product = relationship("Product")
-    order = relationship("Order", back_populates="sales")
+    product = relationship("Product", lazy="raise_on_sql")
+    order = relationship("Order", back_populates="sales", lazy="raise_on_sql")
 
 
 class Business(Base):
@@ -59,14 +63,19 @@ class Business(Base):
     password_hash = Column(String(255), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    users = relationship("User", back_populates="business")
-    products = relationship("Product", back_populates="business")
-    subscription = relationship("Subscription", back_populates="business", uselist=False)
-    orders = relationship("Order", back_populates="business")
+    users = relationship("User", back_populates="business", lazy="raise_on_sql")
+    products = relationship("Product", back_populates="business", lazy="raise_on_sql")
+    subscription = relationship("Subscription", back_populates="business", uselist=False, lazy="raise_on_sql")
+    orders = relationship("Order", back_populates="business", lazy="raise_on_sql")
 
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # superadmin client list: owner per business (MIN(id) ... role != 'superadmin')
+        Index("ix_users_business_role", "business_id", "role"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     business_id = Column(Integer, ForeignKey("business.id"), nullable=True)
     username = Column(String(50), unique=True, nullable=False)
@@ -77,12 +86,17 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True)
 
-    business = relationship("Business", back_populates="users")
-    orders = relationship("Order", back_populates="creator")
+    business = relationship("Business", back_populates="users", lazy="raise_on_sql")
+    branch = relationship("Branch", back_populates="users", lazy="raise_on_sql")
+    orders = relationship("Order", back_populates="creator", lazy="raise_on_sql")
 
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        # One subscription per business; superadmin activate upserts on it
+        UniqueConstraint("business_id", name="uq_subscription_business"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     business_id = Column(Integer, ForeignKey("business.id"), nullable=True)
@@ -100,11 +114,16 @@ class Subscription(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    business = relationship("Business", back_populates="subscription")
+    business = relationship("Business", back_populates="subscription", lazy="raise_on_sql")
 
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Covers MAX(created_at) / SUM(total_amount) per business
+        Index("ix_orders_business_created_amount", "business_id", "created_at", "total_amount"),
+    )
+
 
     id = Column(Integer, primary_key=True, index=True)
     order_code = Column(String(20), unique=True, index=True)
@@ -113,21 +132,27 @@ class Order(Base):
     client_name = Column(String(100), nullable=True)
     sales_person = Column(String(100), nullable=True)
 
-    total_amount = Column(Float, nullable=False, default=0)
+    total_amount = Column(Numeric(10, 2, asdecimal=False), nullable=False, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    business = relationship("Business", back_populates="orders")
-    sales = relationship("Sales", back_populates="order")
-    creator = relationship("User", back_populates="orders")
+    business = relationship("Business", back_populates="orders", lazy="raise_on_sql")
+    sales = relationship("Sales", back_populates="order", lazy="raise_on_sql")
+    creator = relationship("User", back_populates="orders", lazy="raise_on_sql")
 
 class PushSubscription(Base):
     __tablename__ = "push_subscriptions"
+    __table_args__ = (
+        UniqueConstraint("endpoint_hash", name="uq_push_endpoint_hash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)
     business_id = Column(Integer, nullable=False, index=True)
 
     endpoint = Column(Text, nullable=False)
+    # SHA-256 hex of endpoint. MySQL can't put a full-length UNIQUE on TEXT,
+    # so /push/subscribe upserts on this instead
+    endpoint_hash = Column(String(64), nullable=False)
     p256dh = Column(String(255), nullable=False)
     auth = Column(String(255), nullable=False)
 
@@ -157,9 +182,9 @@ class Branch(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    business = relationship("Business")
-    users = relationship("User", backref="branch")
-    staff_members = relationship("Staff", back_populates="branch")
+    business = relationship("Business", lazy="raise_on_sql")
+    users = relationship("User", back_populates="branch", lazy="raise_on_sql")
+    staff_members = relationship("Staff", back_populates="branch", lazy="raise_on_sql")
 
 class Staff(Base):
     __tablename__ = "staff"
@@ -179,10 +204,21 @@ class Staff(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    branch = relationship("Branch", back_populates="staff_members")
+    branch = relationship("Branch", back_populates="staff_members", lazy="raise_on_sql")
 
 class StockMovement(Base):
     __tablename__ = "stock_movements"
+    __table_args__ = (
+        # recent movements per product
+        Index("ix_stock_movements_business_product_created", "business_id", "product_id", "created_at"),
+        # latest ISSUE / IN listings (assign and restock pages); MySQL has no
+        # partial indexes, so movement_type is an equality key column instead
+        Index("ix_sm_type_recent", "business_id", "movement_type", "created_at"),
+        Index("ix_sm_branch_type_recent", "business_id", "branch_id", "movement_type", "created_at"),
+        # dashboard "recent movements" feed (any type)
+        Index("ix_sm_biz_created", "business_id", "created_at"),
+        Index("ix_sm_biz_branch_created", "business_id", "branch_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -202,14 +238,38 @@ class StockMovement(Base):
     # Negative for ISSUE / outgoing transfer
 
     staff_id = Column(Integer, ForeignKey("staff.id"), nullable=True)
-    from_branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True)
+    from_branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True, index=True)
+
+    # Restock (IN) details
+    supplier = Column(String(100), nullable=True)
+    invoice_number = Column(String(100), nullable=True)
 
     notes = Column(Text, nullable=True)
 
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    product = relationship("Product")
-    branch = relationship("Branch", foreign_keys=[branch_id])
-    staff = relationship("Staff")
-    creator = relationship("User")
\ No newline at end of file
+    product = relationship("Product", lazy="raise_on_sql")
+    branch = relationship("Branch", foreign_keys=[branch_id], lazy="raise_on_sql")
+    staff = relationship("Staff", lazy="raise_on_sql")
+    creator = relationship("User", lazy="raise_on_sql")
+
+
+class ProductStock(Base):
+    """Running stock total per product and branch.
+
+    Updated in the same transaction as every StockMovement insert, so reads
+    don't have to SUM the whole movement history.
+    """
+    __tablename__ = "product_stock"
+    __table_args__ = (
+        UniqueConstraint("product_id", "branch_id", "business_id", name="uq_product_stock"),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    business_id = Column(Integer, ForeignKey("business.id"), nullable=False, index=True)
+    branch_id = Column(Integer, ForeignKey("branches.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+
+    quantity = Column(Integer, nullable=False, default=0)
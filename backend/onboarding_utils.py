@@ -1,10 +1,39 @@
-from sqlalchemy.exc import IntegrityError
+from cachetools import TTLCache
+from sqlalchemy import insert
 from backend import models
 
+# business_id -> (/onboarding/status step flags, logged event names). The
+# frontend polls the endpoint and the state changes rarely; recording an
+# event, or creating a product without one (inventory.create_product), drops
+# the entry.
+STATUS_CACHE_TTL = 30  # seconds
+status_cache = TTLCache(maxsize=10_000, ttl=STATUS_CACHE_TTL)
+
+def _onboarding_insert(business_id: int, events: list[str]):
+    # One INSERT IGNORE for all events; duplicates (uq_onboarding_event) are skipped
+    return insert(models.OnboardingEvent).values(
+        [{"business_id": business_id, "event": event} for event in events]
+    ).prefix_with("IGNORE", dialect="mysql")
+
+def record_onboarding_events(db, business_id: int, events: list[str]):
+    if not events:
+        return
+
+    db.execute(_onboarding_insert(business_id, events))
+    db.commit()
+    status_cache.pop(business_id, None)
+
 def record_onboarding_event(db, business_id: int, event: str):
-    try:
-        obj = models.OnboardingEvent(business_id=business_id, event=event)
-        db.add(obj)
-        db.commit()
-    except IntegrityError:
-        db.rollback()  # already exists (unique constraint), ignore
+    record_onboarding_events(db, business_id, [event])
+
+async def record_onboarding_events_async(db, business_id: int, events: list[str]):
+    # Same as record_onboarding_events, for AsyncSession callers
+    if not events:
+        return
+
+    await db.execute(_onboarding_insert(business_id, events))
+    await db.commit()
+    status_cache.pop(business_id, None)
+
+async def record_onboarding_event_async(db, business_id: int, event: str):
+    await record_onboarding_events_async(db, business_id, [event])
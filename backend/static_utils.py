@@ -0,0 +1,45 @@
+import re
+import stat
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+
+# e.g. app.3f9a1c2b.js — content-hashed, safe to cache forever
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+
+# Must be revalidated so PWA updates reach installed clients
+NO_CACHE_FILES = {"service-worker.js", "manifest.json"}
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with Cache-Control headers and precompressed .gz support.
+
+    If `<file>.gz` exists next to a file (e.g. `gzip -k -9 app.js` at deploy
+    time) and the client accepts gzip, the compressed copy is sent as-is.
+    """
+
+    def cache_control(self, path: str) -> str:
+        name = path.rsplit("/", 1)[-1]
+        if name in NO_CACHE_FILES:
+            return "no-cache"
+        if HASHED_NAME_RE.search(name):
+            return "public, max-age=31536000, immutable"
+        return "public, max-age=86400"
+
+    async def get_response(self, path: str, scope):
+        response = None
+
+        if "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+            gz_path, gz_stat = await anyio.to_thread.run_sync(self.lookup_path, path + ".gz")
+            if gz_stat is not None and stat.S_ISREG(gz_stat.st_mode):
+                response = self.file_response(gz_path, gz_stat, scope)
+                response.headers["Content-Encoding"] = "gzip"
+
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = self.cache_control(path)
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
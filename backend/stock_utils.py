@@ -0,0 +1,49 @@
+from sqlalchemy import bindparam, update
+from sqlalchemy.dialects.mysql import insert
+from backend import models
+
+# ProductStock helpers. They run inside the caller's transaction, so the
+# running total commits (or rolls back) together with its StockMovement.
+
+async def add_stock_many(db, business_id: int, quantities: dict[tuple[int, int], int]):
+    # {(branch_id, product_id): quantity} -> one multi-row upsert
+    stmt = insert(models.ProductStock).values([
+        {
+            "business_id": business_id,
+            "branch_id": branch_id,
+            "product_id": product_id,
+            "quantity": quantity
+        }
+        for (branch_id, product_id), quantity in quantities.items()
+    ])
+    await db.execute(stmt.on_duplicate_key_update(
+        quantity=models.ProductStock.quantity + stmt.inserted.quantity
+    ))
+
+async def add_stock(db, business_id: int, branch_id: int, product_id: int, quantity: int):
+    await add_stock_many(db, business_id, {(branch_id, product_id): quantity})
+
+# Conditional decrement: the row lock held by the UPDATE serialises
+# concurrent issues, so stock can't be checked and spent twice.
+# Built once; each call only binds values.
+TAKE_STOCK_STMT = (
+    update(models.ProductStock)
+    .where(
+        models.ProductStock.business_id == bindparam("business_id"),
+        models.ProductStock.branch_id == bindparam("branch_id"),
+        models.ProductStock.product_id == bindparam("product_id"),
+        models.ProductStock.quantity >= bindparam("quantity")
+    )
+    .values(quantity=models.ProductStock.quantity - bindparam("quantity"))
+    # no ProductStock objects live in the session; skip evaluate/fetch sync
+    .execution_options(synchronize_session=False)
+)
+
+async def take_stock(db, business_id: int, branch_id: int, product_id: int, quantity: int) -> bool:
+    result = await db.execute(TAKE_STOCK_STMT, {
+        "business_id": business_id,
+        "branch_id": branch_id,
+        "product_id": product_id,
+        "quantity": quantity
+    })
+    return result.rowcount == 1
@@ -1,47 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, Request
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Form, Request
 from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
 from passlib.context import CryptContext
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from backend import models
-from backend.db import SessionLocal
+from backend.db import get_db, get_engine, SessionLocal
 from backend.auth_utils import (
     create_access_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ACCESS_TOKEN_EXPIRE_SECONDS,
+    ACCESS_TOKEN_EXPIRES,
     SECRET_KEY,
     ALGORITHM,
-    verify_token
+    verify_token,
+    require_roles,
+    CurrentUser,
+    blacklist_token,
+    decode_token,
+    invalidate_user,
+    JWTError
 )
 from backend.config import templates
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+# Argon2id for new hashes; bcrypt hashes still verify and get upgraded on login
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=3,
+    argon2__memory_cost=65536,
+    argon2__parallelism=os.cpu_count() or 1,
+)
 
+# Bounded pool for CPU/memory-heavy hashing so a login burst can't run
+# dozens of 64 MiB argon2 computations at once across the request threadpool
+hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="pwd-hash")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+def hash_password(password: str) -> str:
+    return hash_pool.submit(pwd_context.hash, password).result()
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    return hash_pool.submit(pwd_context.verify, password, password_hash).result()
+
+
+# Verified against when the username doesn't exist, so a miss costs the same
+# as a wrong password (no username enumeration via response time)
+# Computing it at import also loads the argon2 backend; probe bcrypt too so
+# the first legacy-hash login doesn't pay for backend detection
+DUMMY_HASH = pwd_context.hash("dummy")
+pwd_context.handler("bcrypt").get_backend()
+
+
+# Auth cookie policy, shared by register and both login paths
+AUTH_COOKIE_KW = dict(
+    key="access_token",
+    httponly=True,
+    secure=True,
+    samesite="lax",
+    max_age=ACCESS_TOKEN_EXPIRE_SECONDS
+)
+
+
+def set_auth_cookie(response, token: str):
+    response.set_cookie(value=token, **AUTH_COOKIE_KW)
+
+
+def _duplicate_key(e: IntegrityError) -> str | None:
+    # Name of the UNIQUE key behind a MySQL duplicate-entry error (1062), e.g.
+    # "username" from "Duplicate entry 'x' for key 'users.username'"; None for
+    # any other integrity failure (FK, NOT NULL, ...)
+    args = getattr(e.orig, "args", ())
+    if len(args) < 2 or args[0] != 1062:
+        return None
+    return str(args[1]).rsplit(" for key ", 1)[-1].strip("'").rsplit(".", 1)[-1]
 
 
 # ✅ Dashboard redirect
 @router.get("/dashboard")
 def get_dashboard(
     request: Request,
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(verify_token),
 ):
     business_name = "Superadmin"
 
-    if current_user.business_id:
-        biz = db.query(models.Business).filter(
-            models.Business.id == current_user.business_id
-        ).first()
-        if biz:
-            business_name = biz.business_name
+    # business name comes with the cached verify_token snapshot
+    if current_user.business_id and current_user.business:
+        business_name = current_user.business.business_name
 
     return templates.TemplateResponse(
         "index.html",
@@ -69,20 +121,19 @@ async def login_page(request: Request):
 @router.get("/manage_user", response_class=HTMLResponse)
 def manage_user_page(
     request: Request,
-    current_user: models.User = Depends(verify_token),
+    current_user: models.User = Depends(require_roles("admin", detail="Access denied")),
     db: Session = Depends(get_db)
 ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Access denied")
-
     business_id = current_user.business_id
 
-    staff_list = db.query(models.User).filter(
+    staff_list = db.query(models.User).options(
+        selectinload(models.User.branch), raiseload("*")
+    ).filter(
         models.User.business_id == business_id,
         models.User.role.in_(["manager", "storekeeper"])
     ).all()
 
-    branches = db.query(models.Branch).filter(
+    branches = db.query(models.Branch).options(raiseload("*")).filter(
         models.Branch.business_id == business_id
     ).all()
 
@@ -99,20 +150,17 @@ def manage_user_page(
 def manage_staff_page(
     request: Request,
     branch_id: int = None,
-    current_user: models.User = Depends(verify_token),
+    current_user: models.User = Depends(require_roles("admin", detail="Access denied")),
     db: Session = Depends(get_db)
 ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    branches = db.query(models.Branch).filter(
+    branches = db.query(models.Branch).options(raiseload("*")).filter(
         models.Branch.business_id == current_user.business_id
     ).all()
 
     staff_list = []
 
     if branch_id:
-        staff_list = db.query(models.Staff).filter(
+        staff_list = db.query(models.Staff).options(raiseload("*")).filter(
             models.Staff.branch_id == branch_id,
             models.Staff.business_id == current_user.business_id
         ).all()
@@ -138,66 +186,67 @@ def register_business(
     db: Session = Depends(get_db)
 ):
     try:
+        # One timestamp for every row created here (naive UTC, like the columns)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
         clean_password = password.strip()
 
-        if db.query(models.Business).filter(models.Business.email == email).first():
-            raise HTTPException(status_code=400, detail="Email already registered")
+        password_hash = hash_password(clean_password)
 
-        if db.query(models.User).filter(models.User.username == username).first():
-            raise HTTPException(status_code=400, detail="Username already taken")
+        # Core inserts: ids come back as lastrowid, no ORM unit-of-work/refresh
+        business_id = db.execute(
+            insert(models.Business).values(
+                business_name=business_name,
+                username=username,
+                email=email,
+                phone=phone,
+                password_hash=password_hash
+            )
+        ).inserted_primary_key[0]
 
-        # Create business
-        new_business = models.Business(
-            business_name=business_name,
-            username=username,
-            email=email,
-            phone=phone,
-            password_hash=pwd_context.hash(clean_password)
+        db.execute(
+            update(models.Business)
+            .where(models.Business.id == business_id)
+            .values(business_code=f"RP{business_id}")
         )
-        db.add(new_business)
-        db.commit()
-        db.refresh(new_business)
-
-        new_business.business_code = f"RP{new_business.id}"
-        db.commit()
 
         # Create admin user
-        admin_user = models.User(
-            business_id=new_business.id,
-            username=username,
-            password_hash=pwd_context.hash(clean_password),
-            role="admin",
-            is_active=1,
-            last_login=datetime.utcnow()
-        )
-        db.add(admin_user)
-        db.commit()
-        db.refresh(admin_user)
+        admin_id = db.execute(
+            insert(models.User).values(
+                business_id=business_id,
+                username=username,
+                password_hash=password_hash,
+                role="admin",
+                is_active=1,
+                last_login=now
+            )
+        ).inserted_primary_key[0]
 
         # Create trial subscription
-        trial_end = datetime.utcnow() + timedelta(days=7)
-        new_subscription = models.Subscription(
-            business_id=new_business.id,
-            status="trial",
-            start_date=datetime.utcnow(),
-            end_date=trial_end,
-            is_active=True,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+        trial_end = now + timedelta(days=7)
+        db.execute(
+            insert(models.Subscription).values(
+                business_id=business_id,
+                status="trial",
+                start_date=now,
+                end_date=trial_end,
+                is_active=True,
+                created_at=now,
+                updated_at=now
+            )
         )
-        db.add(new_subscription)
+
+        # Business, admin and subscription are committed together
         db.commit()
 
         # AUTO LOGIN TOKEN
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
             data={
-                "user_id": admin_user.id,
-                "username": admin_user.username,
-                "business_id": admin_user.business_id,
-                "role": admin_user.role
+                "user_id": admin_id,
+                "username": username,
+                "business_id": business_id,
+                "role": "admin"
             },
-            expires_delta=access_token_expires
+            expires_delta=ACCESS_TOKEN_EXPIRES
         )
 
         response = JSONResponse(content={
@@ -205,38 +254,73 @@ def register_business(
             "redirect": "/inventory/dashboard"
         })
 
-        response.set_cookie(
-            key="access_token",
-            value=access_token,
-            httponly=True,
-            secure=True,
-            samesite="lax",
-            max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60
-        )
+        set_auth_cookie(response, access_token)
 
         return response
 
-    except Exception as e:
+    except IntegrityError as e:
+        # business.email / users.username are UNIQUE; the insert is the check
         db.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        key = _duplicate_key(e)
+        if key == "username":
+            raise HTTPException(status_code=400, detail="Username already taken")
+        if key == "email":
+            raise HTTPException(status_code=400, detail="Email already registered")
+        logger.exception("register_business failed")
+        raise HTTPException(status_code=400, detail="Registration failed")
+
+    except Exception:
+        db.rollback()
+        logger.exception("register_business failed")
+        raise HTTPException(status_code=400, detail="Registration failed")
+
+
+def _record_login(user_id: int, when: datetime, password_hash: str | None = None):
+    # Runs after the login response is sent, on its own session
+    values = {"last_login": when, "is_active": 1}
+    if password_hash:
+        values["password_hash"] = password_hash
+
+    get_engine()
+    db = SessionLocal()
+    try:
+        db.execute(update(models.User).where(models.User.id == user_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+    invalidate_user(user_id)
 
 
 # ✅ Login + Subscription Validation + SUPERADMIN BYPASS
 @router.post("/login_form")
-def login_user(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
+def login_user(
+    background_tasks: BackgroundTasks,
+    username: str = Form(...),
+    password: str = Form(...),
+    db: Session = Depends(get_db)
+):
     try:
-        user = db.query(models.User).filter(models.User.username == username).first()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        user = (
+            db.query(models.User)
+            .options(
+                joinedload(models.User.business).joinedload(models.Business.subscription)
+            )
+            .filter(models.User.username == username)
+            .first()
+        )
 
-        if not user or not pwd_context.verify(password, user.password_hash):
+        password_ok = verify_password(password, user.password_hash if user else DUMMY_HASH)
+        if not user or not password_ok:
             raise HTTPException(status_code=400, detail="Invalid username or password")
 
+        # Transparently move legacy bcrypt hashes to argon2 (saved with last_login below)
+        new_hash = hash_password(password) if pwd_context.needs_update(user.password_hash) else None
+
         # SUPERADMIN BYPASS
         if user.role == "superadmin":
-            user.is_active = 1
-            user.last_login = datetime.utcnow()
-            db.commit()
+            background_tasks.add_task(_record_login, user.id, now, new_hash)
 
-            access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
             access_token = create_access_token(
                 data={
                     "user_id": user.id,
@@ -244,29 +328,18 @@ def login_user(username: str = Form(...), password: str = Form(...), db: Session
                     "business_id": user.business_id,
                     "role": user.role
                 },
-                expires_delta=access_token_expires
+                expires_delta=ACCESS_TOKEN_EXPIRES
             )
 
             response = RedirectResponse(url="/superadmin/admin_panel", status_code=302)
-            response.set_cookie(
-                key="access_token",
-                value=access_token,
-                httponly=True,
-                secure=True,
-                samesite="lax",
-                max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60
-            )
+            set_auth_cookie(response, access_token)
             return response
 
-        subscription = db.query(models.Subscription).filter(
-            models.Subscription.business_id == user.business_id
-        ).first()
+        subscription = user.business.subscription if user.business else None
 
         if not subscription:
             raise HTTPException(status_code=400, detail="Subscription record missing. Contact support.")
 
-        now = datetime.utcnow()
-
         if subscription.status == "suspended":
             raise HTTPException(status_code=403, detail="Your account is suspended.")
 
@@ -282,11 +355,9 @@ def login_user(username: str = Form(...), password: str = Form(...), db: Session
             db.commit()
             raise HTTPException(status_code=403, detail="Your subscription has expired.")
 
-        user.is_active = 1
-        user.last_login = datetime.utcnow()
-        db.commit()
+        # last_login / is_active are written after the response goes out
+        background_tasks.add_task(_record_login, user.id, now, new_hash)
 
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
             data={
                 "user_id": user.id,
@@ -294,21 +365,14 @@ def login_user(username: str = Form(...), password: str = Form(...), db: Session
                 "business_id": user.business_id,
                 "role": user.role
             },
-            expires_delta=access_token_expires
+            expires_delta=ACCESS_TOKEN_EXPIRES
         )
 
         redirect_url = "/inventory/dashboard"
 
         response = RedirectResponse(url=redirect_url, status_code=302)
 
-        response.set_cookie(
-            key="access_token",
-            value=access_token,
-            httponly=True,
-            secure=True,
-            samesite="lax",
-            max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60
-        )
+        set_auth_cookie(response, access_token)
         return response
 
     except Exception as e:
@@ -320,45 +384,43 @@ def create_user_member(
     password: str = Form(...),
     role: str = Form(...),
     branch_id: int = Form(...),  # 🔥 required now
-    current_user: models.User = Depends(verify_token),
+    current_user: models.User = Depends(require_roles("admin", detail="Access denied")),
     db: Session = Depends(get_db)
 ):
-    # 🔒 Admin only
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Access denied")
-
     # ✅ Only allow manager or storekeeper
     if role not in ["manager", "storekeeper"]:
         raise HTTPException(status_code=400, detail="Invalid role selected")
 
     # 🔎 Validate branch exists and belongs to this business
-    branch = db.query(models.Branch).filter(
-        models.Branch.id == branch_id,
-        models.Branch.business_id == current_user.business_id
-    ).first()
-
-    if not branch:
+    branch_ok = db.query(
+        db.query(models.Branch).filter(
+            models.Branch.id == branch_id,
+            models.Branch.business_id == current_user.business_id
+        ).exists()
+    ).scalar()
+
+    if not branch_ok:
         raise HTTPException(status_code=400, detail="Invalid branch selected")
 
-    # 🚫 Prevent duplicate username
-    existing = db.query(models.User).filter(
-        models.User.username == username
-    ).first()
-
-    if existing:
-        raise HTTPException(status_code=400, detail="Username already exists")
-
     new_user = models.User(
         business_id=current_user.business_id,
         branch_id=branch_id,  # 🔥 critical
         username=username,
-        password_hash=pwd_context.hash(password.strip()),
+        password_hash=hash_password(password.strip()),
         role=role,
         is_active=1
     )
 
     db.add(new_user)
-    db.commit()
+
+    # 🚫 Duplicate usernames are rejected by the UNIQUE constraint
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if _duplicate_key(e) != "username":
+            raise
+        raise HTTPException(status_code=400, detail="Username already exists")
 
     return RedirectResponse(
         url="/auth/manage_user",
@@ -369,18 +431,17 @@ def create_user_member(
 def create_staff_member(
     full_name: str = Form(...),
     branch_id: int = Form(...),
-    current_user: models.User = Depends(verify_token),
+    current_user: models.User = Depends(require_roles("admin", detail="Access denied")),
     db: Session = Depends(get_db)
 ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    branch = db.query(models.Branch).filter(
-        models.Branch.id == branch_id,
-        models.Branch.business_id == current_user.business_id
-    ).first()
-
-    if not branch:
+    branch_ok = db.query(
+        db.query(models.Branch).filter(
+            models.Branch.id == branch_id,
+            models.Branch.business_id == current_user.business_id
+        ).exists()
+    ).scalar()
+
+    if not branch_ok:
         raise HTTPException(status_code=400, detail="Invalid branch")
 
     new_staff = models.Staff(
@@ -391,7 +452,14 @@ def create_staff_member(
     )
 
     db.add(new_staff)
-    db.commit()
+
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if _duplicate_key(e) != "uq_staff_name_branch":
+            raise
+        raise HTTPException(status_code=400, detail="Staff member already exists in this branch")
 
     return RedirectResponse(
         url=f"/auth/manage_staff?branch_id={branch_id}",
@@ -399,7 +467,15 @@ def create_staff_member(
     )
 # ✅ Logout
 @router.get("/logout")
-def logout_user():
+def logout_user(request: Request):
+    token = request.cookies.get("access_token")
+    if token:
+        try:
+            invalidate_user(decode_token(token).get("user_id"))
+        except JWTError:
+            pass
+        blacklist_token(token)
+
     response = RedirectResponse(url="/auth/login")
     response.delete_cookie("access_token")
     return response
\ No newline at end of file
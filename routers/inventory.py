@@ -1,51 +1,111 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import asyncio
+import hashlib
+from collections import defaultdict
+from typing import List, Optional
+from cachetools import TTLCache
+from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Form, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload
+from sqlalchemy import bindparam, func, insert, select
 from backend import models
-from backend.db import SessionLocal
-from backend.auth_utils import verify_token
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from backend.db import get_async_db, fetch_all
+from backend.auth_utils import require_roles, verify_token
+from backend.onboarding_utils import status_cache
+from backend.stock_utils import add_stock, add_stock_many, take_stock
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from backend.config import templates
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+# Hot statements built once at import; SQLAlchemy's compiled cache then
+# serves them on every request (values go in as bound parameters)
+PRODUCT_STOCK_STMT = select(models.ProductStock.quantity).where(
+    models.ProductStock.product_id == bindparam("product_id"),
+    models.ProductStock.business_id == bindparam("business_id"),
+    models.ProductStock.branch_id == bindparam("branch_id")
+)
+
+BUSINESS_STOCK_STMT = select(
+    models.ProductStock.product_id,
+    models.ProductStock.branch_id,
+    models.ProductStock.quantity
+).where(
+    models.ProductStock.business_id == bindparam("business_id")
+)
+
+# business_id -> (stock version, [(product_id, branch_id, qty), ...]) from
+# product_stock. Every stock change inserts a movement, so the business's
+# newest movement id is the stock version; an entry is only served for the
+# version it was read under (the one the page's ETag hashes), so a read that
+# raced a write can't be served under the newer ETag, on this or any worker.
+# restock_product / assign_stock also drop the entry after they commit.
+STOCK_CACHE = TTLCache(maxsize=1024, ttl=60)
+
+
+async def _stock_rows(db: AsyncSession, business_id: int, version):
+    cached = STOCK_CACHE.get(business_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    rows = [tuple(r) for r in (await db.execute(
+        BUSINESS_STOCK_STMT, {"business_id": business_id}
+    )).all()]
+    STOCK_CACHE[business_id] = (version, rows)
+    return rows
+
+
+async def _page_etag(db: AsyncSession, request: Request, current_user) -> tuple[str, int | None]:
+    # -> (ETag, stock version for _stock_rows)
+    # Branches, products and movements are only ever inserted, so the newest
+    # id of each is a version for everything these pages show
+    business_id = current_user.business_id
+    versions = (await db.execute(select(
+        select(func.max(models.StockMovement.id)).where(
+            models.StockMovement.business_id == business_id
+        ).scalar_subquery(),
+        select(func.max(models.Product.id)).where(
+            models.Product.business_id == business_id
+        ).scalar_subquery(),
+        select(func.max(models.Branch.id)).where(
+            models.Branch.business_id == business_id
+        ).scalar_subquery()
+    ))).one()
+
+    # Pages are per user (header, role/branch scoping)
+    key = f"{request.url}|{current_user.id}|{current_user.role}|{current_user.branch_id}|{tuple(versions)}"
+    return '"' + hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '"', versions[0]
+
+
+def _etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def _mutation_result(redirect: bool, url: str, message: str, new_id: int):
+    # JSON by default so scripted clients skip the POST-redirect-GET render;
+    # plain HTML forms post with ?redirect=1 and get the old 303
+    if redirect:
+        return RedirectResponse(f"{url}?success={message}", status_code=303)
+    return {"ok": True, "id": new_id, "message": message}
 
 
 # =============================
 # PRODUCT STOCK (BRANCH AWARE)
 # =============================
 @router.get("/product_stock/{product_id}/{branch_id}")
-def get_product_stock(
+async def get_product_stock(
     product_id: int,
     branch_id: int,
     current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
 
-    # Validate branch belongs to this business
-    branch = db.query(models.Branch).filter(
-        models.Branch.id == branch_id,
-        models.Branch.business_id == current_user.business_id
-    ).first()
-
-    if not branch:
-        return JSONResponse({"stock": 0})
-
-    total_stock = db.query(
-        func.coalesce(func.sum(models.StockMovement.quantity), 0)
-    ).filter(
-        models.StockMovement.product_id == product_id,
-        models.StockMovement.business_id == current_user.business_id,
-        models.StockMovement.branch_id == branch_id
-    ).scalar()
+    # Scoped by business_id, so another business's branch simply has no row
+    total_stock = (await db.execute(PRODUCT_STOCK_STMT, {
+        "product_id": product_id,
+        "business_id": current_user.business_id,
+        "branch_id": branch_id
+    })).scalar()
 
     return JSONResponse({"stock": int(total_stock or 0)})
 
@@ -53,81 +113,56 @@ def get_product_stock(
 # PRODUCTS PAGE (MULTI-BRANCH VIEW)
 # =============================
 @router.get("/products", response_class=HTMLResponse)
-def products_page(
+async def products_page(
     request: Request,
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(require_roles("admin", "manager")),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if current_user.role not in ["admin", "manager"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    # Get branches for this business
-    branches = db.query(models.Branch).filter(
-        models.Branch.business_id == current_user.business_id
-    ).all()
-
-    # Get all products
-    products = db.query(models.Product).filter(
-        models.Product.business_id == current_user.business_id
-    ).all()
-
-    # Get stock grouped by product + branch
-    stock_rows = db.query(
-        models.StockMovement.product_id,
-        models.StockMovement.branch_id,
-        func.coalesce(func.sum(models.StockMovement.quantity), 0).label("quantity")
-    ).filter(
-        models.StockMovement.business_id == current_user.business_id
-    ).group_by(
-        models.StockMovement.product_id,
-        models.StockMovement.branch_id
-    ).all()
-
-    # Convert to dictionary
-    stock_map = {}
-    for row in stock_rows:
-        stock_map.setdefault(row.product_id, {})
-        stock_map[row.product_id][row.branch_id] = row.quantity
-
-    # Structure data for template
-    product_data = []
-
-    for product in products:
-        row = {
-            "id": product.id,
-            "name": product.name,
-            "branches": {},
-            "total": 0
-        }
-
-        for branch in branches:
-            qty = stock_map.get(product.id, {}).get(branch.id, 0)
-            row["branches"][branch.id] = qty
-            row["total"] += qty
-
-        product_data.append(row)
-
-    return templates.TemplateResponse(
-        "products.html",
-        {
-            "request": request,
-            "products": product_data,
-            "current_user": current_user,
-            "branches": branches
-        }
+    etag, stock_version = await _page_etag(db, request, current_user)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=_etag_headers(etag))
+
+    # Branches, products and stock per product + branch don't depend on
+    # each other: run them concurrently. The page only shows id/name, so
+    # fetch plain rows instead of hydrating ORM objects
+    branches, products, stock_rows = await asyncio.gather(
+        fetch_all(select(models.Branch.id, models.Branch.name).where(
+            models.Branch.business_id == current_user.business_id
+        ), scalars=False),
+        fetch_all(select(models.Product.id, models.Product.name).where(
+            models.Product.business_id == current_user.business_id
+        ), scalars=False),
+        _stock_rows(db, current_user.business_id, stock_version)
     )
+
+    # One pass: product -> {branch -> qty} plus per-product totals
+    grid = defaultdict(dict)
+    totals = defaultdict(int)
+    for product_id, branch_id, qty in stock_rows:
+        grid[product_id][branch_id] = qty
+        totals[product_id] += qty
+
+    # Stream the rendered rows instead of building the whole page in memory
+    stream = templates.get_template("products.html").stream({
+        "request": request,
+        "products": products,
+        "grid": grid,
+        "totals": totals,
+        "current_user": current_user,
+        "branches": branches
+    })
+    stream.enable_buffering(5)
+
+    return StreamingResponse(stream, media_type="text/html", headers=_etag_headers(etag))
 # =============================
 # ADD PRODUCT PAGE
 # =============================
 @router.get("/add_product", response_class=HTMLResponse)
-def add_product_page(
+async def add_product_page(
     request: Request,
     success: str | None = None,
-    current_user: models.User = Depends(verify_token)
+    current_user: models.User = Depends(require_roles("admin", "manager", detail="Access denied"))
 ):
-    if current_user.role not in ["admin", "manager"]:
-        raise HTTPException(status_code=403, detail="Access denied")
-
     return templates.TemplateResponse(
         "add_product.html",
         {"request": request, "success": success,"current_user": current_user}
@@ -138,20 +173,24 @@ def add_product_page(
 # MANAGE BRANCHES
 # =============================
 @router.get("/manage_branches", response_class=HTMLResponse)
-def manage_branches(
+async def manage_branches(
     request: Request,
     success: str | None = None,
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(require_roles("admin", detail="Access denied")),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Access denied")
+    etag, _ = await _page_etag(db, request, current_user)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=_etag_headers(etag))
 
-    branches = db.query(models.Branch).filter(
-        models.Branch.business_id == current_user.business_id
-    ).all()
+    # Only the listed columns, as rows
+    branches = (await db.execute(
+        select(models.Branch.id, models.Branch.name, models.Branch.location).where(
+            models.Branch.business_id == current_user.business_id
+        )
+    )).all()
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "manage_branches.html",
         {
             "request": request,
@@ -160,6 +199,8 @@ def manage_branches(
             "success": success
         }
     )
+    response.headers.update(_etag_headers(etag))
+    return response
 
 
 # =============================
@@ -169,55 +210,67 @@ def manage_branches(
 # INVENTORY OVERVIEW
 # =============================
 @router.get("/dashboard", response_class=HTMLResponse)
-def inventory_overview(
+async def inventory_overview(
     request: Request,
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(require_roles("admin", "manager")),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if current_user.role not in ["admin", "manager"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
+    etag, stock_version = await _page_etag(db, request, current_user)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=_etag_headers(etag))
 
     # Scope: admin = all branches, manager = own branch only
-    if current_user.role == "admin":
-        branches = db.query(models.Branch).filter(
-            models.Branch.business_id == current_user.business_id
-        ).all()
-    else:
-        branches = db.query(models.Branch).filter(
-            models.Branch.business_id == current_user.business_id,
-            models.Branch.id == current_user.branch_id
-        ).all()
-
-    branch_ids = [b.id for b in branches]
+    branches_stmt = select(models.Branch).options(raiseload("*")).where(
+        models.Branch.business_id == current_user.business_id
+    )
+    if current_user.role != "admin":
+        branches_stmt = branches_stmt.where(models.Branch.id == current_user.branch_id)
 
     # All products for this business
-    products = db.query(models.Product).filter(
+    products_stmt = select(models.Product).options(raiseload("*")).where(
         models.Product.business_id == current_user.business_id
-    ).all()
-
-    total_products = len(products)
+    )
 
-    # Stock per product+branch (current stock = sum of movements)
-    stock_rows = db.query(
-        models.StockMovement.product_id,
-        models.StockMovement.branch_id,
-        func.coalesce(func.sum(models.StockMovement.quantity), 0).label("stock")
-    ).filter(
+    # Recent movements (last 10) with product name
+    recent_q = select(
+        models.StockMovement.created_at,
+        models.StockMovement.movement_type,
+        models.StockMovement.quantity,
+        models.Product.name.label("product_name")
+    ).join(
+        models.Product,
+        models.Product.id == models.StockMovement.product_id
+    ).where(
         models.StockMovement.business_id == current_user.business_id
     )
 
     if current_user.role != "admin":
-        stock_rows = stock_rows.filter(models.StockMovement.branch_id == current_user.branch_id)
+        recent_q = recent_q.where(models.StockMovement.branch_id == current_user.branch_id)
+
+    recent_q = recent_q.order_by(
+        models.StockMovement.created_at.desc()
+    ).limit(10)
+
+    # Independent reads, run concurrently
+    branches, products, all_stock_rows, recent_movements = await asyncio.gather(
+        fetch_all(branches_stmt),
+        fetch_all(products_stmt),
+        _stock_rows(db, current_user.business_id, stock_version),
+        fetch_all(recent_q, scalars=False)
+    )
 
-    stock_rows = stock_rows.group_by(
-        models.StockMovement.product_id,
-        models.StockMovement.branch_id
-    ).all()
+    branch_ids = {b.id for b in branches}
+
+    total_products = len(products)
+
+    # Stock per product+branch (running totals kept in product_stock);
+    # managers only see their branch, which is the only one in branch_ids
+    stock_rows = [r for r in all_stock_rows if r[1] in branch_ids]
 
     stock_map = {}
-    for r in stock_rows:
-        stock_map.setdefault(r.product_id, {})
-        stock_map[r.product_id][r.branch_id] = int(r.stock or 0)
+    for product_id, branch_id, qty in stock_rows:
+        stock_map.setdefault(product_id, {})
+        stock_map[product_id][branch_id] = int(qty or 0)
 
     # Totals
     total_units = 0
@@ -252,40 +305,12 @@ def inventory_overview(
                     "stock": qty
                 })
 
-    # Recent movements (last 10) with product name
-    recent_q = db.query(
-        models.StockMovement.created_at,
-        models.StockMovement.movement_type,
-        models.StockMovement.quantity,
-        models.Product.name.label("product_name")
-    ).join(
-        models.Product,
-        models.Product.id == models.StockMovement.product_id
-    ).filter(
-        models.StockMovement.business_id == current_user.business_id
-    )
-
-    if current_user.role != "admin":
-        recent_q = recent_q.filter(models.StockMovement.branch_id == current_user.branch_id)
-
-    recent_movements = recent_q.order_by(
-        models.StockMovement.created_at.desc()
-    ).limit(10).all()
-
     # Branch summary (units per branch)
     branches_summary = []
     if branches:
-        branch_sums = db.query(
-            models.StockMovement.branch_id,
-            func.coalesce(func.sum(models.StockMovement.quantity), 0).label("total_units")
-        ).filter(
-            models.StockMovement.business_id == current_user.business_id,
-            models.StockMovement.branch_id.in_(branch_ids)
-        ).group_by(
-            models.StockMovement.branch_id
-        ).all()
-
-        sums_map = {int(x.branch_id): int(x.total_units or 0) for x in branch_sums}
+        sums_map = defaultdict(int)
+        for _, branch_id, qty in stock_rows:
+            sums_map[branch_id] += int(qty or 0)
 
         for br in branches:
             units = sums_map.get(br.id, 0)
@@ -312,7 +337,7 @@ def inventory_overview(
             "stock": total
         })
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "index.html",
         {
             "request": request,
@@ -326,50 +351,56 @@ def inventory_overview(
             "stock_data": stock_data
         }
     )
+    response.headers.update(_etag_headers(etag))
+    return response
 
 
 # =============================
 # ASSIGN PAGE
 # =============================
 @router.get("/assign", response_class=HTMLResponse)
-def assign_page(
+async def assign_page(
     request: Request,
     success: str | None = None,
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(require_roles("admin", "storekeeper"))
 ):
-
-    if current_user.role not in ["admin", "storekeeper"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    products = db.query(models.Product).filter(
+    products_query = select(models.Product).options(raiseload("*")).where(
         models.Product.business_id == current_user.business_id
-    ).all()
+    )
 
-    staff_query = db.query(models.Staff).filter(
+    staff_query = select(models.Staff).options(raiseload("*")).where(
         models.Staff.business_id == current_user.business_id
     )
 
     if current_user.role != "admin":
-        staff_query = staff_query.filter(
+        staff_query = staff_query.where(
             models.Staff.branch_id == current_user.branch_id
         )
 
-    staff_list = staff_query.all()
-
-    movements_query = db.query(models.StockMovement).filter(
+    movements_query = select(models.StockMovement).options(
+        joinedload(models.StockMovement.product),
+        joinedload(models.StockMovement.staff),
+        raiseload("*")
+    ).where(
         models.StockMovement.business_id == current_user.business_id,
         models.StockMovement.movement_type == "ISSUE"
     )
 
     if current_user.role != "admin":
-        movements_query = movements_query.filter(
+        movements_query = movements_query.where(
             models.StockMovement.branch_id == current_user.branch_id
         )
 
-    movements = movements_query.order_by(
+    movements_query = movements_query.order_by(
         models.StockMovement.created_at.desc()
-    ).limit(10).all()
+    ).limit(10)
+
+    # Independent reads, run concurrently
+    products, staff_list, movements = await asyncio.gather(
+        fetch_all(products_query),
+        fetch_all(staff_query),
+        fetch_all(movements_query)
+    )
 
     return templates.TemplateResponse(
         "assign_stock.html",
@@ -388,37 +419,43 @@ def assign_page(
 # RESTOCK PAGE
 # =============================
 @router.get("/restock", response_class=HTMLResponse)
-def restock_page(
+async def restock_page(
     request: Request,
     success: str | None = None,
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(require_roles("admin", "manager"))
 ):
-
-    if current_user.role not in ["admin", "manager"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    products = db.query(models.Product).filter(
+    products_query = select(models.Product).options(raiseload("*")).where(
         models.Product.business_id == current_user.business_id
-    ).all()
+    )
 
-    branches = db.query(models.Branch).filter(
+    branches_query = select(models.Branch).options(raiseload("*")).where(
         models.Branch.business_id == current_user.business_id
-    ).all()
+    )
 
-    movements_query = db.query(models.StockMovement).filter(
+    movements_query = select(models.StockMovement).options(
+        joinedload(models.StockMovement.product),
+        joinedload(models.StockMovement.branch),
+        raiseload("*")
+    ).where(
         models.StockMovement.business_id == current_user.business_id,
         models.StockMovement.movement_type == "IN"
     )
 
     if current_user.role != "admin":
-        movements_query = movements_query.filter(
+        movements_query = movements_query.where(
             models.StockMovement.branch_id == current_user.branch_id
         )
 
-    movements = movements_query.order_by(
+    movements_query = movements_query.order_by(
         models.StockMovement.created_at.desc()
-    ).limit(10).all()
+    ).limit(10)
+
+    # Independent reads, run concurrently
+    products, branches, movements = await asyncio.gather(
+        fetch_all(products_query),
+        fetch_all(branches_query),
+        fetch_all(movements_query)
+    )
 
     return templates.TemplateResponse(
         "restock.html",
@@ -437,64 +474,52 @@ def restock_page(
 # ASSIGN STOCK
 # =============================
 @router.post("/assign_stock")
-def assign_stock(
+async def assign_stock(
     product_id: int = Form(...),
     staff_id: int = Form(...),
     quantity: int = Form(...),
     notes: str = Form(None),
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    redirect: bool = False,
+    current_user: models.User = Depends(require_roles("admin", "storekeeper")),
+    db: AsyncSession = Depends(get_async_db)
 ):
-
-    if current_user.role not in ["admin", "storekeeper"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than zero")
 
-    staff_query = db.query(models.Staff).filter(
+    # Only the columns the checks need, no ORM hydration
+    staff_query = select(models.Staff.branch_id).where(
         models.Staff.id == staff_id,
         models.Staff.business_id == current_user.business_id
     )
 
     if current_user.role != "admin":
-        staff_query = staff_query.filter(
+        staff_query = staff_query.where(
             models.Staff.branch_id == current_user.branch_id
         )
 
-    staff = staff_query.first()
+    staff_branch_id = (await db.execute(staff_query)).scalar()
 
-    if not staff:
+    if staff_branch_id is None:
         raise HTTPException(status_code=400, detail="Invalid staff")
 
-    product = db.query(models.Product).filter(
-        models.Product.id == product_id,
-        models.Product.business_id == current_user.business_id
-    ).first()
-
-    if not product:
-        raise HTTPException(status_code=400, detail="Invalid product")
-
-    stock_query = db.query(
-        func.coalesce(func.sum(models.StockMovement.quantity), 0)
-    ).filter(
-        models.StockMovement.product_id == product_id,
-        models.StockMovement.business_id == current_user.business_id
-    )
-
-    if current_user.role != "admin":
-        stock_query = stock_query.filter(
-            models.StockMovement.branch_id == current_user.branch_id
+    product_ok = (await db.execute(
+        select(models.Product.id).where(
+            models.Product.id == product_id,
+            models.Product.business_id == current_user.business_id
         )
+    )).scalar()
 
-    current_stock = stock_query.scalar()
+    if product_ok is None:
+        raise HTTPException(status_code=400, detail="Invalid product")
 
-    if current_stock < quantity:
+    # Check and decrement the staff member's branch stock in one statement
+    if not await take_stock(db, current_user.business_id, staff_branch_id, product_id, quantity):
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Not enough stock")
 
     movement = models.StockMovement(
         business_id=current_user.business_id,
-        branch_id=staff.branch_id,
+        branch_id=staff_branch_id,
         product_id=product_id,
         movement_type="ISSUE",
         quantity=-quantity,
@@ -504,41 +529,38 @@ def assign_stock(
     )
 
     db.add(movement)
-    db.commit()
+    await db.commit()
+    STOCK_CACHE.pop(current_user.business_id, None)
 
-    return RedirectResponse(
-        "/inventory/assign?success=Stock assigned successfully",
-        status_code=303
-    )
+    return _mutation_result(redirect, "/inventory/assign", "Stock assigned successfully", movement.id)
 
 
 # =============================
 # RESTOCK
 # =============================
 @router.post("/restock")
-def restock_product(
+async def restock_product(
     product_id: int = Form(...),
     quantity: int = Form(...),
     branch_id: int = Form(None),
     supplier: str = Form(None),
     invoice_number: str = Form(None),
     notes: str = Form(None),
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    redirect: bool = False,
+    current_user: models.User = Depends(require_roles("admin", "manager")),
+    db: AsyncSession = Depends(get_async_db)
 ):
-
-    if current_user.role not in ["admin", "manager"]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than zero")
 
-    product = db.query(models.Product).filter(
-        models.Product.id == product_id,
-        models.Product.business_id == current_user.business_id
-    ).first()
+    product_ok = (await db.execute(
+        select(models.Product.id).where(
+            models.Product.id == product_id,
+            models.Product.business_id == current_user.business_id
+        )
+    )).scalar()
 
-    if not product:
+    if product_ok is None:
         raise HTTPException(status_code=400, detail="Invalid product")
 
     if current_user.role == "manager":
@@ -546,6 +568,9 @@ def restock_product(
     else:
         if not branch_id:
             raise HTTPException(status_code=400, detail="Branch is required")
+        # Same check as restock_batch: the branch must belong to this business
+        if not await _business_ids(db, models.Branch, {branch_id}, current_user.business_id):
+            raise HTTPException(status_code=400, detail="Invalid branch")
         branch_id_to_use = branch_id
 
     movement = models.StockMovement(
@@ -554,33 +579,182 @@ def restock_product(
         product_id=product_id,
         movement_type="IN",
         quantity=quantity,
-        notes=f"Supplier: {supplier or ''} | Invoice: {invoice_number or ''} | {notes or ''}",
+        supplier=supplier,
+        invoice_number=invoice_number,
+        notes=notes,
         created_by=current_user.id
     )
 
     db.add(movement)
-    db.commit()
+    await add_stock(db, current_user.business_id, branch_id_to_use, product_id, quantity)
+    await db.commit()
+    STOCK_CACHE.pop(current_user.business_id, None)
+
+    return _mutation_result(redirect, "/inventory/restock", "Stock added successfully", movement.id)
+
+
+# =============================
+# BATCH INPUT MODELS
+# =============================
+class AssignItem(BaseModel):
+    product_id: int
+    staff_id: int
+    quantity: int
+    notes: Optional[str] = None
+
+class RestockItem(BaseModel):
+    product_id: int
+    quantity: int
+    branch_id: Optional[int] = None
+    supplier: Optional[str] = None
+    invoice_number: Optional[str] = None
+    notes: Optional[str] = None
+
+
+async def _business_ids(db: AsyncSession, model, ids, business_id: int) -> set:
+    # Which of `ids` belong to this business, in one query
+    return set((await db.execute(
+        select(model.id).where(model.id.in_(ids), model.business_id == business_id)
+    )).scalars().all())
+
 
-    return RedirectResponse(
-        "/inventory/restock?success=Stock added successfully",
-        status_code=303
+# =============================
+# ASSIGN STOCK (BATCH)
+# =============================
+@router.post("/assign_stock_batch")
+async def assign_stock_batch(
+    items: List[AssignItem],
+    current_user: models.User = Depends(require_roles("admin", "storekeeper")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not items:
+        raise HTTPException(status_code=400, detail="No items")
+
+    if any(item.quantity <= 0 for item in items):
+        raise HTTPException(status_code=400, detail="Quantity must be greater than zero")
+
+    staff_query = select(models.Staff.id, models.Staff.branch_id).where(
+        models.Staff.id.in_({item.staff_id for item in items}),
+        models.Staff.business_id == current_user.business_id
     )
 
+    if current_user.role != "admin":
+        staff_query = staff_query.where(
+            models.Staff.branch_id == current_user.branch_id
+        )
+
+    staff_branch = dict((await db.execute(staff_query)).all())
+
+    if any(item.staff_id not in staff_branch for item in items):
+        raise HTTPException(status_code=400, detail="Invalid staff")
+
+    product_ids = await _business_ids(
+        db, models.Product, {item.product_id for item in items}, current_user.business_id
+    )
+
+    if any(item.product_id not in product_ids for item in items):
+        raise HTTPException(status_code=400, detail="Invalid product")
+
+    # Total requested per (branch, product); decremented in a fixed order so
+    # concurrent batches lock product_stock rows consistently
+    needed = defaultdict(int)
+    for item in items:
+        needed[(staff_branch[item.staff_id], item.product_id)] += item.quantity
+
+    for branch_id, product_id in sorted(needed):
+        if not await take_stock(db, current_user.business_id, branch_id, product_id, needed[(branch_id, product_id)]):
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Not enough stock")
+
+    await db.execute(insert(models.StockMovement), [
+        {
+            "business_id": current_user.business_id,
+            "branch_id": staff_branch[item.staff_id],
+            "product_id": item.product_id,
+            "movement_type": "ISSUE",
+            "quantity": -item.quantity,
+            "staff_id": item.staff_id,
+            "notes": item.notes,
+            "created_by": current_user.id
+        }
+        for item in items
+    ])
+    await db.commit()
+    STOCK_CACHE.pop(current_user.business_id, None)
+
+    return {"message": "Stock assigned successfully", "count": len(items)}
+
+
+# =============================
+# RESTOCK (BATCH)
+# =============================
+@router.post("/restock_batch")
+async def restock_batch(
+    items: List[RestockItem],
+    current_user: models.User = Depends(require_roles("admin", "manager")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not items:
+        raise HTTPException(status_code=400, detail="No items")
+
+    if any(item.quantity <= 0 for item in items):
+        raise HTTPException(status_code=400, detail="Quantity must be greater than zero")
+
+    product_ids = await _business_ids(
+        db, models.Product, {item.product_id for item in items}, current_user.business_id
+    )
+
+    if any(item.product_id not in product_ids for item in items):
+        raise HTTPException(status_code=400, detail="Invalid product")
+
+    if current_user.role != "manager":
+        if any(not item.branch_id for item in items):
+            raise HTTPException(status_code=400, detail="Branch is required")
+
+        branch_ids = await _business_ids(
+            db, models.Branch, {item.branch_id for item in items}, current_user.business_id
+        )
+
+        if any(item.branch_id not in branch_ids for item in items):
+            raise HTTPException(status_code=400, detail="Invalid branch")
+
+    rows = []
+    added = defaultdict(int)
+    for item in items:
+        branch_id = current_user.branch_id if current_user.role == "manager" else item.branch_id
+        added[(branch_id, item.product_id)] += item.quantity
+        rows.append({
+            "business_id": current_user.business_id,
+            "branch_id": branch_id,
+            "product_id": item.product_id,
+            "movement_type": "IN",
+            "quantity": item.quantity,
+            "supplier": item.supplier,
+            "invoice_number": item.invoice_number,
+            "notes": item.notes,
+            "created_by": current_user.id
+        })
+
+    # One executemany for the movements, one multi-row upsert for the totals
+    await db.execute(insert(models.StockMovement), rows)
+    await add_stock_many(db, current_user.business_id, added)
+    await db.commit()
+    STOCK_CACHE.pop(current_user.business_id, None)
+
+    return {"message": "Stock added successfully", "count": len(items)}
+
 
 # =============================
 # CREATE BRANCH
 # =============================
 @router.post("/create_branch")
-def create_branch(
+async def create_branch(
     name: str = Form(...),
     location: str = Form(None),
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    redirect: bool = False,
+    current_user: models.User = Depends(require_roles("admin", detail="Access denied")),
+    db: AsyncSession = Depends(get_async_db)
 ):
-
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Access denied")
-
     new_branch = models.Branch(
         business_id=current_user.business_id,
         name=name,
@@ -588,29 +762,23 @@ def create_branch(
     )
 
     db.add(new_branch)
-    db.commit()
+    await db.commit()
 
-    return RedirectResponse(
-        "/inventory/manage_branches?success=Branch created successfully",
-        status_code=303
-    )
+    return _mutation_result(redirect, "/inventory/manage_branches", "Branch created successfully", new_branch.id)
 
 
 # =============================
 # CREATE PRODUCT
 # =============================
 @router.post("/create_product")
-def create_product(
+async def create_product(
     name: str = Form(...),
     buying_price: float = Form(0),
     min_stock: int = Form(5),
-    current_user: models.User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    redirect: bool = False,
+    current_user: models.User = Depends(require_roles("admin", "manager", detail="Access denied")),
+    db: AsyncSession = Depends(get_async_db)
 ):
-
-    if current_user.role not in ["admin", "manager"]:
-        raise HTTPException(status_code=403, detail="Access denied")
-
     new_product = models.Product(
         business_id=current_user.business_id,
         name=name,
@@ -619,9 +787,8 @@ def create_product(
     )
 
     db.add(new_product)
-    db.commit()
+    await db.commit()
+    # /onboarding/status caches has_product for the business
+    status_cache.pop(current_user.business_id, None)
 
-    return RedirectResponse(
-        "/inventory/add_product?success=Product created successfully",
-        status_code=303
-    )
\ No newline at end of file
+    return _mutation_result(redirect, "/inventory/add_product", "Product created successfully", new_product.id)
\ No newline at end of file
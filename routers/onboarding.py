@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.db import SessionLocal
+from backend.db import get_async_db
 from backend import models
 from backend.auth_utils import verify_token
-from backend.onboarding_utils import record_onboarding_event
+from backend.onboarding_utils import record_onboarding_event_async, status_cache
 
 router = APIRouter(
     prefix="/onboarding",
@@ -12,72 +13,65 @@ router = APIRouter(
     dependencies=[Depends(verify_token)]
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 # ✅ NEW: mark installed (called from frontend when app is running as installed/PWA)
 @router.post("/mark_installed")
-def mark_installed(
+async def mark_installed(
     request: Request,
     current_user: dict = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     business_id = current_user.get("business_id")
     if not business_id:
         raise HTTPException(status_code=400, detail="No business_id in token")
 
     # Store as onboarding event (idempotent due to uq_onboarding_event)
-    record_onboarding_event(db, business_id, "install_app")
+    await record_onboarding_event_async(db, business_id, "install_app")
 
     return {"message": "Install recorded"}
 
 @router.get("/status")
-def onboarding_status(
+async def onboarding_status(
     request: Request,
     current_user: dict = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     business_id = current_user.get("business_id")
     if not business_id:
         raise HTTPException(status_code=400, detail="No business_id in token")
 
-    # -----------------------------
-    # Reality checks (DB truth)
-    # -----------------------------
-    has_product = db.query(models.Product).filter(
-        models.Product.business_id == business_id
-    ).first() is not None
-
-    has_sale = db.query(models.Order).filter(
-        models.Order.business_id == business_id
-    ).first() is not None
-
-    # -----------------------------
-    # Event checks (onboarding logs)
-    # -----------------------------
-    viewed_report = db.query(models.OnboardingEvent).filter(
-        models.OnboardingEvent.business_id == business_id,
-        models.OnboardingEvent.event == "view_report"
-    ).first() is not None
-
-    installed_app = db.query(models.OnboardingEvent).filter(
-        models.OnboardingEvent.business_id == business_id,
-        models.OnboardingEvent.event == "install_app"
-    ).first() is not None
-
-    # -----------------------------
-    # ✅ 4-step onboarding
-    # -----------------------------
-    steps = {
-        "add_product": has_product,
-        "sell_product": has_sale,
-        "view_report": viewed_report or has_sale,  # fallback for old users
-        "install_app": installed_app
-    }
+    cached = status_cache.get(business_id)
+
+    if cached is None:
+        # -----------------------------
+        # Reality checks (DB truth), one round trip
+        # -----------------------------
+        has_product, has_sale = (await db.execute(
+            select(
+                exists().where(models.Product.business_id == business_id),
+                exists().where(models.Order.business_id == business_id)
+            )
+        )).one()
+
+        # Every onboarding event logged for the business, one round trip;
+        # the step and activation-modal checks below are set lookups
+        events = set((await db.execute(
+            select(models.OnboardingEvent.event)
+            .where(models.OnboardingEvent.business_id == business_id)
+        )).scalars())
+
+        # -----------------------------
+        # ✅ 4-step onboarding
+        # -----------------------------
+        steps = {
+            "add_product": bool(has_product),
+            "sell_product": bool(has_sale),
+            "view_report": "view_report" in events or bool(has_sale),  # fallback for old users
+            "install_app": "install_app" in events
+        }
+        cached = status_cache[business_id] = (steps, events)
+
+    steps, events = cached
 
     completed = sum(1 for v in steps.values() if v)
     progress = int((completed / 4) * 100)
@@ -104,14 +98,9 @@ def onboarding_status(
         # show only once for each stage
         stage_event = f"activation_modal_shown:{next_action}"
 
-        already_shown = db.query(models.OnboardingEvent).filter(
-            models.OnboardingEvent.business_id == business_id,
-            models.OnboardingEvent.event == stage_event
-        ).first() is not None
-
-        if not already_shown:
+        if stage_event not in events:
             show_activation_modal = True
-            record_onboarding_event(db, business_id, stage_event)
+            await record_onboarding_event_async(db, business_id, stage_event)
 
     return {
         "steps": steps,
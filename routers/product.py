@@ -1,12 +1,15 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, Form, Body, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
-from backend.db import SessionLocal
+from backend.db import get_db
 from backend import models
 from backend.config import templates
 from backend.auth_utils import verify_token
 from backend.onboarding_utils import record_onboarding_event
 
+logger = logging.getLogger(__name__)
+
 # ✅ Define base URL for production (Railway)
 BASE_URL = "https://pos-10-production.up.railway.app"
 
@@ -16,14 +19,6 @@ router = APIRouter(
     dependencies=[Depends(verify_token)]
 )
 
-# ---------------- DB DEPENDENCY ----------------
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 # ---------------- HTML ROUTES ----------------
 
@@ -98,16 +93,16 @@ def add_product(
 
 @router.get("/")
 def get_products(current_use: dict = Depends(verify_token), db: Session = Depends(get_db)):
-    print("🔹 current_use =", current_use)
+    logger.debug("current_use = %s", current_use)
     business_id = current_use.get("business_id")
 
     if not business_id:
-        print("❌ No business_id found in token!")
+        logger.debug("No business_id found in token")
         # Redirect to login if user is not authenticated
         return RedirectResponse(url=f"{BASE_URL}/auth/login")
 
     products = db.query(models.Product).filter(models.Product.business_id == business_id).all()
-    print("✅ Found products:", products)
+    logger.debug("Found %d products", len(products))
     return products
 
 # ---------------- UPDATE STOCK ----------------
@@ -1,24 +1,18 @@
+import hashlib
 import os
-from fastapi import APIRouter, Depends, HTTPException, Request, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Body
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.db import SessionLocal
+from backend.db import get_async_db
 from backend.auth_utils import verify_token
 from backend import models
 
 router = APIRouter(prefix="/push", tags=["push"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/vapid_public_key")
-def vapid_public_key():
+async def vapid_public_key():
     """
     Return the VAPID public key for the browser Push API.
     IMPORTANT: This must be the 'B...' base64url key (no padding).
@@ -43,16 +37,16 @@ def vapid_public_key():
 
 
 @router.post("/subscribe")
-def subscribe(request: Request, payload: dict = Body(...), db: Session = Depends(get_db)):
-    token_data = verify_token(request)
-    if not token_data:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-
-    user = db.query(models.User).filter(models.User.id == token_data["user_id"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    if not user.business_id:
+async def subscribe(
+    payload: dict = Body(...),
+    current_user: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # verify_token already resolved the (cached) user; no extra User query
+    user_id = current_user["user_id"]
+    business_id = current_user["business_id"]
+
+    if not business_id:
         raise HTTPException(status_code=400, detail="User has no business_id (cannot subscribe)")
 
     endpoint = payload.get("endpoint")
@@ -63,27 +57,25 @@ def subscribe(request: Request, payload: dict = Body(...), db: Session = Depends
     if not endpoint or not p256dh or not auth:
         raise HTTPException(status_code=400, detail="Invalid subscription payload")
 
-    # ✅ UPSERT by endpoint (same device updates if they re-subscribe)
-    existing = db.query(models.PushSubscription).filter(
-        models.PushSubscription.endpoint == endpoint
-    ).first()
-
-    if existing:
-        existing.user_id = user.id
-        existing.business_id = user.business_id
-        existing.p256dh = p256dh
-        existing.auth = auth
-        db.commit()
-        return {"message": "Updated subscription"}
-
-    sub = models.PushSubscription(
-        user_id=user.id,
-        business_id=user.business_id,
+    # ✅ UPSERT by endpoint (same device updates if they re-subscribe).
+    # One atomic statement on the unique endpoint_hash, no select-then-write race
+    stmt = insert(models.PushSubscription).values(
+        user_id=user_id,
+        business_id=business_id,
         endpoint=endpoint,
+        endpoint_hash=hashlib.sha256(endpoint.encode()).hexdigest(),
         p256dh=p256dh,
         auth=auth
     )
-
-    db.add(sub)
-    db.commit()
+    await db.execute(stmt.on_duplicate_key_update(
+        user_id=stmt.inserted.user_id,
+        business_id=stmt.inserted.business_id,
+        p256dh=stmt.inserted.p256dh,
+        auth=stmt.inserted.auth
+    ))
+    await db.commit()
+
+    # One message for both cases: with CLIENT_FOUND_ROWS (set by SQLAlchemy)
+    # an unchanged re-subscribe reports 1 row, same as an insert, so rowcount
+    # can't tell a new device from a repeat
     return {"message": "Subscribed"}
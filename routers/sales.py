@@ -5,7 +5,7 @@ from sqlalchemy import text
 from pydantic import BaseModel
 from typing import List, Optional
 
-from backend.db import SessionLocal
+from backend.db import get_db
 from backend import models
 from backend.config import templates
 from backend.auth_utils import verify_token
@@ -17,15 +17,6 @@ router = APIRouter(
     dependencies=[Depends(verify_token)]
 )
 
-# -------------------------
-# DB Session
-# -------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 # -------------------------
 # Pages
@@ -89,20 +80,20 @@ def record_sale(sale_data: SaleRequest, request: Request, db: Session = Depends(
     # --------------------------------------------------
     # ✅ NEW: check if business already has a REAL sale
     # --------------------------------------------------
-    has_real_sale = (
+    has_real_sale = db.query(
         db.query(models.Sales)
         .join(models.Order, models.Sales.order_id == models.Order.id)
         .filter(
             models.Order.business_id == business_id,
             models.Sales.is_demo == False
         )
-        .first()
-    )
+        .exists()
+    ).scalar()
 
     # --------------------------------------------------
     # ✅ NEW: demo only if onboarding + no real sales yet
     # --------------------------------------------------
-    is_demo_sale = (is_onboarding and has_real_sale is None)
+    is_demo_sale = (is_onboarding and not has_real_sale)
 
     # --------------------------------------------------
     # ✅ FIX: if this is a REAL sale, delete any old demo sale rows + demo orders
@@ -1,60 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, Request, Body
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func, case   # ✅ ADDED: case
-from datetime import datetime, timedelta
-from passlib.context import CryptContext
+import asyncio
+import hashlib
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Form, Request, Response, Body
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import delete, exists, func, literal_column, select, update
+from datetime import datetime, timedelta, timezone
 import pytz
-from pathlib import Path
-from backend.db import SessionLocal
-from backend.auth_utils import verify_token
+from cachetools import TTLCache
+from backend.db import AsyncSessionLocal, get_async_db, get_async_engine
+from backend.auth_utils import require_roles
+from routers.auth import hash_pool, pwd_context
 from backend import models
 from backend.config import templates
-from pywebpush import webpush, WebPushException
-import os, json
+from pywebpush import WebPusher, WebPushException
+from py_vapid import Vapid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+import requests
+import os, time
+from uuid import uuid4
+import orjson
 
 
 router = APIRouter(prefix="/superadmin", tags=["superadmin"])
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
 NAIROBI_TZ = pytz.timezone("Africa/Nairobi")
 
+# East Africa Time has no DST, so a stdlib fixed offset gives the same result
+# as pytz for every date, and the conversion stays in C (no pytz lookups)
+NAIROBI_OFFSET = NAIROBI_TZ.utcoffset(datetime(2000, 1, 1))
+NAIROBI_FIXED = timezone(NAIROBI_OFFSET, "EAT")
 
-# ----------------------------------------------------
-# DB Session
-# ----------------------------------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+def _nairobi_iso(utc_dt, _offset=NAIROBI_OFFSET, _tz=NAIROBI_FIXED):
+    # naive UTC datetime -> Nairobi ISO string. Offset/tz are bound as
+    # defaults: fast locals instead of global lookups, called twice per row
+    if utc_dt is None:
+        return None
+    return (utc_dt + _offset).replace(tzinfo=_tz).isoformat()
+
+# get_all_clients JSON body + its ETag. It's the same for every superadmin; the
+# subscription mutations below clear it, new sales show up within the TTL.
+CLIENTS_CACHE_TTL = 60  # seconds
+clients_cache = TTLCache(maxsize=1, ttl=CLIENTS_CACHE_TTL)
 
 
 # ----------------------------------------------------
 # SUPERADMIN AUTH CHECK
 # ----------------------------------------------------
-def require_superadmin(request: Request, db: Session):
-    token_data = verify_token(request)
-    if not token_data:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-
-    user = db.query(models.User).filter(
-        models.User.id == token_data["user_id"]
-    ).first()
-
-    if not user or user.role != "superadmin":
-        raise HTTPException(status_code=403, detail="Only superadmin allowed")
-
-    return user
+# verify_token resolves the user from the per-user cache (no User query on a
+# hit) and the role check runs before any DB session is opened
+require_superadmin = require_roles("superadmin", detail="Only superadmin allowed")
 
 
 # ----------------------------------------------------
 # SUPERADMIN PANEL PAGE
 # ----------------------------------------------------
 @router.get("/admin_panel", response_class=HTMLResponse)
-def admin_panel_page(request: Request, db: Session = Depends(get_db)):
-    require_superadmin(request, db)
+async def admin_panel_page(request: Request, current_user: models.User = Depends(require_superadmin)):
     return templates.TemplateResponse(
         "super_admin.html",
         {"request": request}
@@ -65,14 +74,14 @@ def admin_panel_page(request: Request, db: Session = Depends(get_db)):
 # CREATE SUPERADMIN (RUN ONCE)
 # ----------------------------------------------------
 @router.post("/create_superadmin")
-def create_superadmin(
+async def create_superadmin(
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    existing = db.query(models.User).filter(
-        models.User.role == "superadmin"
-    ).first()
+    existing = (await db.execute(
+        select(exists().where(models.User.role == "superadmin"))
+    )).scalar()
 
     if existing:
         raise HTTPException(
@@ -80,267 +89,477 @@ def create_superadmin(
             detail="Superadmin already exists!"
         )
 
+    # argon2id in the bounded hash pool, off the event loop
+    password_hash = await asyncio.get_running_loop().run_in_executor(
+        hash_pool, pwd_context.hash, password
+    )
+
     new_superadmin = models.User(
         business_id=None,
         username=username,
-        password_hash=pwd_context.hash(password),
+        password_hash=password_hash,
         role="superadmin",
         is_active=1,
         last_login=datetime.utcnow()
     )
 
     db.add(new_superadmin)
-    db.commit()
+    await db.commit()
 
     return {"message": "🔥 Superadmin created successfully!"}
 
 
-# ----------------------------------------------------
-# 1️⃣ GET ALL CLIENTS + SUBSCRIPTIONS + LAST LOGIN + ✅ NEW METRICS
-#    ✅ Adds:
-#      - products_count
-#      - last_sale_date (from orders)
-#      - total_revenue (sum of orders.total_amount)
-#    ✅ NEW ADDITION:
-#      - is_installed (from onboarding events: event == "install_app")
-#    ✅ Also avoids N+1 queries by using one aggregated query
-# ----------------------------------------------------
-@router.get("/get_all_clients")
-def get_all_clients(request: Request, db: Session = Depends(get_db)):
-    require_superadmin(request, db)
-
-    # ✅ ADDED: aggregated install flag per business (no N+1)
-    install_subq = (
-        db.query(
-            models.OnboardingEvent.business_id.label("business_id"),
-            func.max(
-                case(
-                    (models.OnboardingEvent.event == "install_app", 1),
-                    else_=0
-                )
-            ).label("is_installed")
+def _build_clients_stmt():
+    business = models.Business.__table__
+    subscription = models.Subscription.__table__
+    user = models.User.__table__
+    product = models.Product.__table__
+    order = models.Order.__table__
+    onboarding = models.OnboardingEvent.__table__
+
+    # ✅ ADDED: install flag per business (no N+1): EXISTS probe on
+    # uq_onboarding_event (business_id, event), stops at the first hit
+    is_installed = exists().where(
+        onboarding.c.business_id == business.c.id,
+        onboarding.c.event == "install_app"
+    )
+
+    # Each metric is pre-aggregated per business in its own derived table
+    # (every source table is scanned once) and LEFT JOINed to business, so
+    # the outer query has no GROUP BY and nothing multiplies rows.
+    product_agg = (
+        select(
+            product.c.business_id,
+            func.count(product.c.id).label("products_count")
+        )
+        .group_by(product.c.business_id)
+        .subquery()
+    )
+
+    order_agg = (
+        select(
+            order.c.business_id,
+            func.max(order.c.created_at).label("last_sale_date_utc"),
+            func.sum(order.c.total_amount).label("total_revenue")
+        )
+        .group_by(order.c.business_id)
+        .subquery()
+    )
+
+    # Owner = first non-superadmin user of the business (created at
+    # registration), one row per business
+    user_agg = (
+        select(
+            user.c.business_id,
+            func.min(user.c.id).label("owner_id")
         )
-        .group_by(models.OnboardingEvent.business_id)
+        .where(user.c.role != "superadmin")
+        .group_by(user.c.business_id)
         .subquery()
     )
 
-    rows = (
-        db.query(
-            models.Business.id.label("business_id"),
-            models.Business.business_name,
-            models.Business.phone,
+    stmt = (
+        select(
+            business.c.id.label("business_id"),
+            business.c.business_name,
+            business.c.phone,
 
             # owner
-            models.User.username.label("username"),
-            models.User.last_login.label("last_login_utc"),
+            user.c.username,
+            user.c.last_login.label("last_login_utc"),
 
             # subscription
-            models.Subscription.status.label("subscription_status"),
-            models.Subscription.is_active.label("is_active"),
-            models.Subscription.end_date.label("end_date"),
+            subscription.c.status.label("subscription_status"),
+            subscription.c.is_active,
+            subscription.c.end_date,
 
             # ✅ NEW metrics
-            func.count(func.distinct(models.Product.id)).label("products_count"),
-            func.max(models.Order.created_at).label("last_sale_date_utc"),
-            func.coalesce(func.sum(models.Order.total_amount), 0).label("total_revenue"),
+            func.coalesce(product_agg.c.products_count, 0).label("products_count"),
+            order_agg.c.last_sale_date_utc,
+            func.coalesce(order_agg.c.total_revenue, 0).label("total_revenue"),
 
             # ✅ ADDED: install status (1/0)
-            func.coalesce(install_subq.c.is_installed, 0).label("is_installed"),
-        )
-        .outerjoin(models.Subscription, models.Subscription.business_id == models.Business.id)
-        .outerjoin(
-            models.User,
-            (models.User.business_id == models.Business.id) & (models.User.role != "superadmin")
+            is_installed.label("is_installed"),
         )
-        .outerjoin(models.Product, models.Product.business_id == models.Business.id)
-        .outerjoin(models.Order, models.Order.business_id == models.Business.id)
-
-        # ✅ ADDED: join install subquery
-        .outerjoin(install_subq, install_subq.c.business_id == models.Business.id)
-
-        .group_by(
-            models.Business.id,
-            models.Business.business_name,
-            models.Business.phone,
-            models.User.username,
-            models.User.last_login,
-            models.Subscription.status,
-            models.Subscription.is_active,
-            models.Subscription.end_date,
-            install_subq.c.is_installed,  # ✅ ADDED: needed due to select
+        .select_from(
+            business
+            .outerjoin(subscription, subscription.c.business_id == business.c.id)
+            .outerjoin(user_agg, user_agg.c.business_id == business.c.id)
+            .outerjoin(user, user.c.id == user_agg.c.owner_id)
+            .outerjoin(product_agg, product_agg.c.business_id == business.c.id)
+            .outerjoin(order_agg, order_agg.c.business_id == business.c.id)
         )
-        .all()
     )
+    return stmt
 
-    output = []
-    now_utc = datetime.utcnow()
 
-    for r in rows:
-        # Days left
-        days_left = None
-        if r.end_date:
-            days_left = (r.end_date - now_utc).days
-
-        # last login UTC -> Nairobi time
-        last_login_local = None
-        if r.last_login_utc:
-            last_login_local = r.last_login_utc.replace(tzinfo=pytz.utc).astimezone(NAIROBI_TZ)
-
-        # ✅ last sale UTC -> Nairobi time
-        last_sale_local = None
-        if r.last_sale_date_utc:
-            last_sale_local = r.last_sale_date_utc.replace(tzinfo=pytz.utc).astimezone(NAIROBI_TZ)
-
-        output.append({
-            "business_id": r.business_id,
-            "business_name": r.business_name,
-            "username": r.username,
-            "phone": r.phone,
-
-            "last_login": last_login_local.isoformat() if last_login_local else None,
-            "subscription_status": r.subscription_status if r.subscription_status else "none",
-            "days_left": days_left,
-            "is_active": bool(r.is_active) if r.is_active is not None else False,
+# No parameters, so the statement is built once per process and SQLAlchemy's
+# compiled cache serves the SQL string on every call
+CLIENTS_STMT = _build_clients_stmt()
+
+# ND-JSON variant: server-side cursor, fetched and encoded 200 rows at a time
+CLIENTS_STREAM_BATCH = 200
+CLIENTS_STREAM_STMT = CLIENTS_STMT.execution_options(yield_per=CLIENTS_STREAM_BATCH)
+
+
+def _serialize_clients(rows, now_utc: datetime) -> list:
+    # Rows unpack positionally in CLIENTS_STMT column order; one list
+    # comprehension, with the helper bound to a local name
+    nairobi_iso = _nairobi_iso
+    return [
+        {
+            "business_id": business_id,
+            "business_name": business_name,
+            "username": username,
+            "phone": phone,
+
+            # last login UTC -> Nairobi time
+            "last_login": nairobi_iso(last_login_utc),
+            "subscription_status": subscription_status if subscription_status else "none",
+            "days_left": (end_date - now_utc).days if end_date else None,
+            "is_active": bool(is_active) if is_active is not None else False,
 
             # ✅ NEW fields (for your super admin table)
-            "products_count": int(r.products_count or 0),
-            "last_sale_date": last_sale_local.isoformat() if last_sale_local else None,
-            "total_revenue": float(r.total_revenue or 0),
+            "products_count": int(products_count or 0),
+            # ✅ last sale UTC -> Nairobi time
+            "last_sale_date": nairobi_iso(last_sale_date_utc),
+            "total_revenue": float(total_revenue or 0),
 
             # ✅ ADDED: installation flag
-            "is_installed": bool(r.is_installed),
-        })
-
-    return output
+            "is_installed": bool(is_installed),
+        }
+        for (
+            business_id, business_name, phone,
+            username, last_login_utc,
+            subscription_status, is_active, end_date,
+            products_count, last_sale_date_utc, total_revenue,
+            is_installed,
+        ) in rows
+    ]
+
+
+async def _stream_clients():
+    # Runs while the response is being sent, after get_async_db's session is
+    # closed, so it owns its session
+    now_utc = datetime.utcnow()
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(CLIENTS_STREAM_STMT)
+        async for rows in result.partitions():
+            yield b"".join(orjson.dumps(client) + b"\n" for client in _serialize_clients(rows, now_utc))
 
 
 # ----------------------------------------------------
-# 2️⃣ ACTIVATE SUBSCRIPTION
+# 1️⃣ GET ALL CLIENTS + SUBSCRIPTIONS + LAST LOGIN + ✅ NEW METRICS
+#    ✅ Adds:
+#      - products_count
+#      - last_sale_date (from orders)
+#      - total_revenue (sum of orders.total_amount)
+#    ✅ NEW ADDITION:
+#      - is_installed (from onboarding events: event == "install_app")
+#    ✅ Also avoids N+1 queries by using one aggregated query
 # ----------------------------------------------------
-@router.post("/activate/{business_id}")
-def activate_subscription(
-    business_id: int,
+@router.get("/get_all_clients")
+async def get_all_clients(
     request: Request,
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(require_superadmin),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    require_superadmin(request, db)
-
-    subscription = db.query(models.Subscription).filter(
-        models.Subscription.business_id == business_id
-    ).first()
+    # Clients that ask for ND-JSON get one object per line as rows are read,
+    # in constant memory (bypasses the list cache)
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_clients(), media_type="application/x-ndjson")
+
+    cached = clients_cache.get("clients")
+    if cached is None:
+        # Plain tuples (no ORM row processing, no per-key mapping lookups)
+        rows = (await db.execute(CLIENTS_STMT)).all()
+        body = orjson.dumps(_serialize_clients(rows, datetime.utcnow()))
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        cached = clients_cache["clients"] = (body, etag)
+
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    # Unchanged since the panel's last poll: no body at all
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _update_subscription(db: AsyncSession, business_id: int, **values):
+    # One UPDATE, no Subscription row load / ORM dirty tracking
+    result = await db.execute(
+        update(models.Subscription)
+        .where(models.Subscription.business_id == business_id)
+        .values(**values)
+    )
 
-    if not subscription:
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Subscription not found")
 
-    subscription.status = "active"
-    subscription.is_active = True
-    subscription.start_date = datetime.utcnow()
-    subscription.end_date = datetime.utcnow() + timedelta(days=30)
-    subscription.updated_at = datetime.utcnow()
+    await db.commit()
+    clients_cache.clear()
+
 
-    db.commit()
-    return {"message": "Subscription activated for 30 days"}
+async def _upsert_subscription(db: AsyncSession, business_id: int, **values):
+    # INSERT ... ON DUPLICATE KEY UPDATE on uq_subscription_business: one
+    # atomic statement, and a business without a subscription row gets one
+    stmt = insert(models.Subscription).values(business_id=business_id, **values)
+    try:
+        await db.execute(stmt.on_duplicate_key_update(
+            **{column: stmt.inserted[column] for column in values}
+        ))
+        await db.commit()
+    except IntegrityError:
+        # business.id foreign key
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Business not found")
+
+    clients_cache.clear()
+
+
+def _subscription_changes(action: str) -> dict:
+    # Column values for each subscription action; all applied by one UPDATE
+    now = datetime.utcnow()
+    if action == "activate":
+        return dict(status="active", is_active=True, start_date=now,
+                    end_date=now + timedelta(days=30), updated_at=now)
+    if action == "renew":
+        # +30 days computed by MySQL from the stored value
+        return dict(status="active", is_active=True,
+                    end_date=func.date_add(models.Subscription.end_date, literal_column("INTERVAL 30 DAY")),
+                    updated_at=now)
+    if action == "suspend":
+        return dict(status="suspended", is_active=False, updated_at=now)
+    if action == "reactivate":
+        return dict(status="active", is_active=True, updated_at=now)
+    raise HTTPException(status_code=400, detail="Invalid action")
+
+
+SUBSCRIPTION_MESSAGES = {
+    "activate": "Subscription activated for 30 days",
+    "renew": "Subscription renewed +30 days",
+    "suspend": "Business suspended",
+    "reactivate": "Business reactivated",
+}
 
 
 # ----------------------------------------------------
-# 3️⃣ RENEW +30 DAYS
+# SUBSCRIPTION ACTION (single endpoint)
+#    {"action": "activate" | "renew" | "suspend" | "reactivate"}
 # ----------------------------------------------------
-@router.post("/renew/{business_id}")
-def renew_subscription(
+@router.post("/subscription/{business_id}")
+async def subscription_action(
     business_id: int,
-    request: Request,
-    db: Session = Depends(get_db)
+    payload: dict = Body(...),
+    current_user: models.User = Depends(require_superadmin),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    require_superadmin(request, db)
+    action = payload.get("action")
+    changes = _subscription_changes(action)
+    if action == "activate":
+        await _upsert_subscription(db, business_id, **changes)
+    else:
+        await _update_subscription(db, business_id, **changes)
+    return {"message": SUBSCRIPTION_MESSAGES[action]}
 
-    subscription = db.query(models.Subscription).filter(
-        models.Subscription.business_id == business_id
-    ).first()
 
-    if not subscription:
-        raise HTTPException(status_code=404, detail="Subscription not found")
+# ----------------------------------------------------
+# 2️⃣ ACTIVATE SUBSCRIPTION
+# ----------------------------------------------------
+@router.post("/activate/{business_id}")
+async def activate_subscription(
+    business_id: int,
+    current_user: models.User = Depends(require_superadmin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await _upsert_subscription(db, business_id, **_subscription_changes("activate"))
+    return {"message": SUBSCRIPTION_MESSAGES["activate"]}
 
-    subscription.status = "active"
-    subscription.is_active = True
-    subscription.end_date += timedelta(days=30)
-    subscription.updated_at = datetime.utcnow()
 
-    db.commit()
-    return {"message": "Subscription renewed +30 days"}
+# ----------------------------------------------------
+# 3️⃣ RENEW +30 DAYS
+# ----------------------------------------------------
+@router.post("/renew/{business_id}")
+async def renew_subscription(
+    business_id: int,
+    current_user: models.User = Depends(require_superadmin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await _update_subscription(db, business_id, **_subscription_changes("renew"))
+    return {"message": SUBSCRIPTION_MESSAGES["renew"]}
 
 
 # ----------------------------------------------------
 # 4️⃣ SUSPEND BUSINESS
 # ----------------------------------------------------
 @router.post("/suspend/{business_id}")
-def suspend_account(
+async def suspend_account(
     business_id: int,
-    request: Request,
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(require_superadmin),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    require_superadmin(request, db)
-
-    subscription = db.query(models.Subscription).filter(
-        models.Subscription.business_id == business_id
-    ).first()
-
-    if not subscription:
-        raise HTTPException(status_code=404, detail="Subscription not found")
-
-    subscription.status = "suspended"
-    subscription.is_active = False
-    subscription.updated_at = datetime.utcnow()
-
-    db.commit()
-    return {"message": "Business suspended"}
+    await _update_subscription(db, business_id, **_subscription_changes("suspend"))
+    return {"message": SUBSCRIPTION_MESSAGES["suspend"]}
 
 
 # ----------------------------------------------------
 # 5️⃣ REACTIVATE BUSINESS
 # ----------------------------------------------------
 @router.post("/reactivate/{business_id}")
-def reactivate_account(
+async def reactivate_account(
     business_id: int,
-    request: Request,
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(require_superadmin),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    require_superadmin(request, db)
+    await _update_subscription(db, business_id, **_subscription_changes("reactivate"))
+    return {"message": SUBSCRIPTION_MESSAGES["reactivate"]}
 
-    subscription = db.query(models.Subscription).filter(
-        models.Subscription.business_id == business_id
-    ).first()
 
-    if not subscription:
-        raise HTTPException(status_code=404, detail="Subscription not found")
+# Push sends are network-bound: fan them out over a small thread pool and
+# reuse keep-alive connections to the push services (FCM, Mozilla, ...)
+PUSH_WORKERS = 16
+PUSH_TIMEOUT = 10  # seconds per send, so one stalled endpoint can't pin a worker
+push_pool = ThreadPoolExecutor(max_workers=PUSH_WORKERS, thread_name_prefix="webpush")
+push_session = requests.Session()
+push_session.mount("https://", HTTPAdapter(pool_connections=PUSH_WORKERS, pool_maxsize=PUSH_WORKERS))
+
+
+VAPID_JWT_TTL = 12 * 3600  # seconds, same as pywebpush's default
+
+
+@lru_cache(maxsize=4)
+def _vapid_signer(pem_text: str) -> Vapid:
+    # Parsed once per key instead of writing/re-reading a PEM file per send
+    return Vapid.from_pem(pem_text.encode("utf-8"))
+
+
+def _vapid_headers(signer: Vapid, endpoints, vapid_sub: str) -> dict:
+    # One signed VAPID JWT per push service origin, shared by all its subscribers
+    exp = int(time.time()) + VAPID_JWT_TTL
+    headers = {}
+    for endpoint in endpoints:
+        url = urlparse(endpoint)
+        aud = f"{url.scheme}://{url.netloc}"
+        if aud not in headers:
+            headers[aud] = signer.sign({"sub": vapid_sub, "aud": aud, "exp": exp})
+    return headers
+
+
+def _send_push(sub, data: bytes, vapid_headers: dict):
+    # -> (push service HTTP status on failure, delivered)
+    url = urlparse(sub.endpoint)
+    try:
+        response = WebPusher(
+            {
+                "endpoint": sub.endpoint,
+                "keys": {"p256dh": sub.p256dh, "auth": sub.auth}
+            },
+            requests_session=push_session
+        ).send(
+            data,
+            headers=dict(vapid_headers[f"{url.scheme}://{url.netloc}"]),
+            content_encoding="aes128gcm",
+            timeout=PUSH_TIMEOUT
+        )
+    except requests.RequestException:
+        # Unreachable / stalled push service (connection, TLS, timeout):
+        # a failed send, not a reason to abort the whole job
+        return None, False
+    except WebPushException as ex:
+        status_code = None
+        try:
+            if ex.response is not None:
+                status_code = ex.response.status_code
+        except Exception:
+            status_code = None
+        return status_code, False
+
+    # Same success rule as pywebpush.webpush()
+    if response.status_code > 202:
+        return response.status_code, False
+    return None, True
+
 
-    subscription.status = "active"
-    subscription.is_active = True
-    subscription.updated_at = datetime.utcnow()
+# Reminder jobs run in the background; the POST returns a job id and the
+# panel follows progress over SSE. job_id -> progress dict
+push_jobs = TTLCache(maxsize=256, ttl=3600)
 
-    db.commit()
-    return {"message": "Business reactivated"}
+
+def _push_progress(job: dict) -> dict:
+    return {k: job[k] for k in ("total", "sent", "failed", "deleted", "done")}
+
+
+async def _push_job_update(job: dict, **changes):
+    async with job["changed"]:
+        job.update(changes)
+        job["version"] += 1
+        job["changed"].notify_all()
+
+
+async def _run_push_job(job: dict, subs, send):
+    loop = asyncio.get_running_loop()
+
+    async def send_one(sub):
+        # Blocking HTTP send on the shared push pool; the event loop only waits
+        return sub.id, await loop.run_in_executor(push_pool, send, sub)
+
+    dead_ids = []
+    deleted = 0
+    try:
+        for next_result in asyncio.as_completed([send_one(sub) for sub in subs]):
+            sub_id, (status_code, ok) = await next_result
+            if ok:
+                await _push_job_update(job, sent=job["sent"] + 1)
+                continue
+
+            if status_code in (404, 410):
+                dead_ids.append(sub_id)
+            await _push_job_update(job, failed=job["failed"] + 1)
+    except Exception:
+        logger.exception("Push reminder job failed")
+    finally:
+        # Expired/unsubscribed devices go in one DELETE, even if the send loop
+        # broke off. The request's session is gone by now, so the job uses its own
+        if dead_ids:
+            try:
+                get_async_engine()
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        delete(models.PushSubscription)
+                        .where(models.PushSubscription.id.in_(dead_ids))
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+                deleted = len(dead_ids)
+            except Exception:
+                logger.exception("Deleting stale push subscriptions failed")
+
+        await _push_job_update(job, deleted=deleted, done=True)
 
 
 # ----------------------------------------------------
 # 6️⃣ SEND MANUAL PUSH REMINDER
 # ----------------------------------------------------
 @router.post("/push_reminder/{business_id}")
-def push_reminder(
+async def push_reminder(
     business_id: int,
-    request: Request,
     payload: dict = Body(...),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(require_superadmin),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    require_superadmin(request, db)
-
     title = (payload.get("title") or "").strip()
     message = (payload.get("message") or "").strip()
     if not title or not message:
         raise HTTPException(status_code=400, detail="Title and message are required")
 
-    subs = db.query(models.PushSubscription).filter(
-        models.PushSubscription.business_id == business_id
-    ).all()
+    subs = (await db.execute(
+        select(models.PushSubscription).where(
+            models.PushSubscription.business_id == business_id
+        )
+    )).scalars().all()
 
     if not subs:
         return {"message": "No subscribed devices for this business", "sent": 0, "failed": 0, "deleted": 0}
@@ -351,42 +570,57 @@ def push_reminder(
     if not vapid_private_pem:
         raise HTTPException(status_code=500, detail="VAPID_PRIVATE_KEY_PEM not set")
 
-    pem_text = vapid_private_pem.replace("\\n", "\n").strip()
-    pem_path = Path(f"/tmp/vapid_private_{business_id}.pem")
-    pem_path.write_text(pem_text, encoding="utf-8")
-
-    sent = 0
-    failed = 0
-    deleted = 0
-
-    for sub in subs:
-        try:
-            webpush(
-                subscription_info={
-                    "endpoint": sub.endpoint,
-                    "keys": {"p256dh": sub.p256dh, "auth": sub.auth}
-                },
-                data=json.dumps({"title": title, "body": message, "url": "/auth/dashboard"}),
-                vapid_private_key=str(pem_path),
-                vapid_claims={"sub": vapid_sub}
-            )
-            sent += 1
-
-        except WebPushException as ex:
-            failed += 1
+    signer = _vapid_signer(vapid_private_pem.replace("\\n", "\n").strip())
 
-            status_code = None
-            try:
-                if ex.response is not None:
-                    status_code = ex.response.status_code
-            except Exception:
-                status_code = None
+    send = partial(
+        _send_push,
+        # encoded once for every device, as bytes (no str -> utf-8 step in the encrypter)
+        data=orjson.dumps({"title": title, "body": message, "url": "/auth/dashboard"}),
+        vapid_headers=_vapid_headers(signer, {sub.endpoint for sub in subs}, vapid_sub)
+    )
 
-            if status_code in (404, 410):
-                db.delete(sub)
-                deleted += 1
+    job_id = uuid4().hex
+    job = push_jobs[job_id] = {
+        "total": len(subs),
+        "sent": 0,
+        "failed": 0,
+        "deleted": 0,
+        "done": False,
+        "version": 0,
+        "changed": asyncio.Condition(),
+    }
+    # Keep a reference so the task isn't garbage collected mid-run
+    job["task"] = asyncio.create_task(_run_push_job(job, subs, send))
+
+    return JSONResponse(
+        status_code=202,
+        content={"message": "Reminder queued", "job_id": job_id, "total": len(subs)}
+    )
 
-    if deleted:
-        db.commit()
 
-    return {"message": "Reminder processed", "sent": sent, "failed": failed, "deleted": deleted}
+# ----------------------------------------------------
+# 7️⃣ PUSH REMINDER PROGRESS (Server-Sent Events)
+# ----------------------------------------------------
+@router.get("/push_reminder/{job_id}/stream")
+async def push_reminder_stream(
+    job_id: str,
+    current_user: models.User = Depends(require_superadmin)
+):
+    job = push_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Reminder job not found")
+
+    async def events():
+        while True:
+            version = job["version"]
+            yield b"data: " + orjson.dumps(_push_progress(job)) + b"\n\n"
+            if job["done"]:
+                return
+            async with job["changed"]:
+                await job["changed"].wait_for(lambda: job["version"] != version)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )